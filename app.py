@@ -1,50 +1,386 @@
 # app.py
+import json
+import mimetypes
 import os
-from flask import Flask, render_template, send_from_directory
-
-app = Flask(__name__)
-
-# ─── CONFIG ─────────────────────────────────────────────────────
-IMAGE_SIZE  = (790, 875)
-STATIC_PATH = 'static'
-LAYER_ORDER = [
-    'background',
-    'accessories2',   # ← new behind bodies, in front of background
-    'bodies',
-    'eyes',
-    'mouth',
-    'shirts',
-    'hairs',
-    'earrings',
-    'toys',
-    'accessories',
-    'health',         # ← overlays everything at 30% opacity
-]
-# ─────────────────────────────────────────────────────────────────
+import threading
+from flask import (Flask, Response, abort, render_template, request, send_from_directory,
+                   stream_with_context)
+from PIL import Image
+from werkzeug.datastructures import ContentRange
+from werkzeug.security import safe_join
+
+from build_assets import BUILD_PATH, PREVIEW_SIZE, normalize
+from config import IMAGE_SIZE, LAYER_ORDER, STATIC_PATH
+from manifest import AssetVariants, AtlasMap, LayerManifest
+from export import encode_png, stream_zip
+from noise import noise_tile
+from render import (WEB_NOISE_CENTER, WEB_NOISE_LEVEL, LayerStore, LRUCache, composite, encode,
+                    layer_image, random_seed)
+from traits import LAYER_CAPACITY, SEED_RADIX, TraitIndex, from_code, to_code
+
+# static_proxy below serves /static, so Flask's built-in static route is off
+app = Flask(__name__, static_folder=None)
+
+# built once at import; folders are re-checked at most once a second
+manifest = LayerManifest(STATIC_PATH, LAYER_ORDER)
+_index_cache = {}    # (manifest version, atlas version, static file hashes) → rendered page
+_page_static = set() # non-layer files the page links through static_url (css, mp3s)
+_page_static_lock = threading.Lock()   # static_url adds while another thread reads the key
+# append-only file registry behind the character IDs; new art is added on sync
+trait_index = TraitIndex(LAYER_ORDER)
+trait_index.sync(manifest.files())
+# packed per-layer sheets from build_assets.py; the page falls back to single files
+atlas_map = AtlasMap(BUILD_PATH)
+
+def page_context(layer_files, static_site=False):
+    """Template variables of index.html; build_site.py bakes the same into a static page."""
+    return dict(
+        layers=LAYER_ORDER,
+        layer_files=layer_files,
+        layer_hashes=manifest.hashes(),
+        layer_registry=trait_index.registry,
+        layer_capacity=LAYER_CAPACITY,
+        atlas=atlas_map.client(),
+        noise=NOISE_INFO,
+        image_size=IMAGE_SIZE,
+        preview_size=PREVIEW_SIZE,
+        static_site=static_site,
+    )
 
 @app.route('/')
 def index():
-    # gather PNGs per layer
-    layer_files = {}
+    version, layer_files = manifest.snapshot()
+    page = _index_cache.get(page_version(version))
+    if page is None:
+        trait_index.sync(layer_files)
+        page = render_template('index.html', **page_context(layer_files))
+        _index_cache.clear()
+        # after rendering, so files linked for the first time are part of the key
+        _index_cache[page_version(version)] = page
+    return page
+
+def page_version(manifest_version):
+    """Cache key of the rendered page: layers, atlas, and every ?v= it links."""
+    with _page_static_lock:
+        paths = sorted(_page_static)
+    static = tuple((path, manifest.file_hash(path)) for path in paths)
+    return manifest_version, atlas_map.version, static
+
+# decoded layers stay resident; rendered combos are kept in a bounded LRU
+layer_store  = LayerStore(STATIC_PATH, IMAGE_SIZE)
+render_cache = LRUCache(max_entries=256)
+RENDER_FORMATS = {'png': 'image/png', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+_render_version = [manifest.version]
+
+def current_layer_files():
+    """Layer listing for the render routes, dropping decoded layers when the art changed."""
+    version, layer_files = manifest.snapshot()
+    if version != _render_version[0]:
+        # art changed on disk; drop anything decoded from the old files
+        layer_store.clear()
+        render_cache.clear()
+        trait_index.sync(layer_files)
+        _render_version[0] = version
+    return layer_files
+
+def decode_id(code):
+    try:
+        return trait_index.decode(from_code(code))
+    except ValueError:
+        abort(400, f"bad id: {code}")
+    except KeyError:
+        abort(404, f"unknown id: {code}")
+
+def int_arg(name):
+    """Integer query parameter, None when absent; 400 when it doesn't parse."""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        abort(400, f"{name} must be an integer: {value}")
+
+def request_character(layer_files):
+    """(selection, seed) from ?id=<code>, or from per-layer file names + ?seed=."""
+    code = request.args.get('id')
+    if code:
+        picks, seed = decode_id(code)
+    else:
+        picks = {layer: request.args.get(layer) for layer in LAYER_ORDER}
+        seed = int_arg('seed')
+        if seed is not None and not 0 <= seed < SEED_RADIX:
+            abort(400, f"seed must be in 0..{SEED_RADIX - 1}")
+    return checked_selection(picks, layer_files), seed
+
+def checked_selection(picks, layer_files):
+    """[(layer, fname)] in LAYER_ORDER; 404 for a file that isn't there."""
+    selection = []
     for layer in LAYER_ORDER:
-        folder = os.path.join(STATIC_PATH, layer)
-        try:
-            files = sorted(f for f in os.listdir(folder) if f.lower().endswith('.png'))
-        except FileNotFoundError:
-            files = []
-        layer_files[layer] = files
-
-    return render_template(
-        'index.html',
-        layers=LAYER_ORDER,
-        layer_files=layer_files,
-        image_size=IMAGE_SIZE
+        fname = picks.get(layer)
+        if not fname:
+            continue
+        if fname not in layer_files.get(layer, ()):
+            abort(404, f"unknown {layer} file: {fname}")
+        selection.append((layer, fname))
+    return selection
+
+@app.route('/render')
+def render():
+    """Flatten one file per layer into a single image.
+
+    /render?background=x.png&bodies=y.png&...&seed=42&w=395&fmt=webp
+    /render?id=<code>&w=395   (character ID from traits.py: layers + seed)
+    Layers left out of the query are skipped.
+    """
+    selection, seed = request_character(current_layer_files())
+    if seed is None:
+        seed = random_seed()
+    width = int_arg('w')
+    if width:
+        width = max(16, min(width, IMAGE_SIZE[0]))
+        size = (width, round(IMAGE_SIZE[1] * width / IMAGE_SIZE[0]))
+    else:
+        size = IMAGE_SIZE
+    fmt = request.args.get('fmt', 'webp')
+    if fmt not in RENDER_FORMATS:
+        abort(400, f"unsupported format: {fmt}")
+
+    key = (tuple(selection), seed, size, fmt)
+    data = render_cache.get(key)
+    if data is None:
+        data = encode(composite(layer_store, selection, seed, size), fmt)
+        render_cache.put(key, data)
+    resp = Response(data, mimetype=RENDER_FORMATS[fmt])
+    resp.headers['X-Render-Seed'] = str(seed)
+    resp.headers['X-Character-Id'] = to_code(trait_index.encode(dict(selection), seed))
+    return resp
+
+EXPORT_MAX_BATCH = 500
+
+def character_entries(folder, selection, seed):
+    """ZIP entries for one character: each noised layer PNG, then metadata.json.
+
+    PNGs are encoded only when the archive reaches them.
+    """
+    code = to_code(trait_index.encode(dict(selection), seed))
+    for layer, fname in selection:
+        yield (f"{folder}{layer}-{fname}",
+               lambda l=layer, f=fname: encode_png(layer_image(layer_store, l, f, seed)))
+    meta = {
+        'id': code, 'seed': seed, 'traits': dict(selection), 'size': IMAGE_SIZE,
+        'noise': {'level': WEB_NOISE_LEVEL, 'center': WEB_NOISE_CENTER},
+    }
+    yield f"{folder}metadata.json", json.dumps(meta, indent=2).encode()
+
+@app.route('/export.zip', methods=['GET', 'POST'])
+def export_zip():
+    """Stream a ZIP of a character's noised layer PNGs plus metadata.json.
+
+    /export.zip?id=<code>   (or per-layer file names + seed, as for /render)
+    /export.zip?ids=<code>,<code>,...   or POST {"ids": [...]}: one folder per
+    character, up to EXPORT_MAX_BATCH of them.
+    The archive is written as it streams; layers come from the shared LayerStore.
+    """
+    layer_files = current_layer_files()
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        codes = body.get('ids') if isinstance(body, dict) else None
+        if not isinstance(codes, list) or not all(isinstance(c, str) for c in codes):
+            abort(400, 'POST body must be {"ids": ["<code>", ...]}')
+    else:
+        codes = [c for c in request.args.get('ids', '').split(',') if c]
+    codes = list(dict.fromkeys(codes))   # one folder per character, first mention wins
+    if codes:
+        if len(codes) > EXPORT_MAX_BATCH:
+            abort(400, f"at most {EXPORT_MAX_BATCH} ids per export")
+        characters = []
+        for code in codes:
+            picks, seed = decode_id(code)
+            characters.append((f"{code}/", checked_selection(picks, layer_files), seed))
+        name = f"mymillios-{len(characters)}.zip"
+    else:
+        selection, seed = request_character(layer_files)
+        if not selection:
+            abort(400, "nothing selected")
+        if seed is None:
+            seed = random_seed()
+        code = to_code(trait_index.encode(dict(selection), seed))
+        characters = [('', selection, seed)]
+        name = f"mymillio-{code}.zip"
+
+    def entries():
+        for folder, selection, seed in characters:
+            yield from character_entries(folder, selection, seed)
+
+    resp = Response(stream_with_context(stream_zip(entries())), mimetype='application/zip')
+    resp.headers['Content-Disposition'] = f'attachment; filename="{name}"'
+    return resp
+
+# the page blends one of these seeded tiles over the whole composite instead
+# of noising each layer in JS; they only change with the noise settings
+NOISE_TILE  = 256
+NOISE_TILES = 8
+NOISE_INFO  = {
+    'size': NOISE_TILE, 'count': NOISE_TILES,
+    'v': f"{NOISE_TILE}-{WEB_NOISE_LEVEL}-{WEB_NOISE_CENTER}".replace('.', ''),
+}
+_noise_pngs = LRUCache(max_entries=NOISE_TILES)
+
+@app.route('/noise/<int:n>')
+def noise_png(n):
+    """Greyscale noise tile `n`: 128 + the per-pixel offset /render would add."""
+    if not 0 <= n < NOISE_TILES:
+        abort(404)
+    data = _noise_pngs.get(n)
+    if data is None:
+        data = encode(noise_tile(n, NOISE_TILE, WEB_NOISE_LEVEL, WEB_NOISE_CENTER), 'png')
+        _noise_pngs.put(n, data)
+    resp = Response(data, mimetype='image/png')
+    if request.args.get('v') == NOISE_INFO['v']:
+        resp.cache_control.public = True
+        resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+        resp.cache_control.immutable = True
+    return resp
+
+# web variants from build_assets.py, preferred over the raw PNGs when present
+asset_variants = AssetVariants(BUILD_PATH)
+VARIANT_FORMATS = ('avif', 'webp')
+
+def accepted_formats():
+    """Image formats the client explicitly accepts, best first, PNG last."""
+    explicit = {value for value, q in request.accept_mimetypes if q > 0}
+    return [f for f in VARIANT_FORMATS if f'image/{f}' in explicit] + ['png']
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# open-ended media ranges (bytes=N-) are answered with at most this much, so
+# playback starts after the first chunk and a seek only fetches from there
+MEDIA_EXTS  = ('.mp3',)
+MEDIA_CHUNK = 512 * 1024
+
+@app.template_global()
+def static_url(path):
+    """Fingerprinted /static URL for a non-layer file (css, mp3s)."""
+    with _page_static_lock:
+        _page_static.add(path)
+    digest = manifest.file_hash(path)
+    return f"/static/{path}?v={digest}" if digest else f"/static/{path}"
+
+# previews for layer files the asset build hasn't caught up with yet
+_previews = LRUCache(max_entries=None, max_bytes=32 * 2**20, weigh=len)
+
+def preview_response(path, digest, fmt, max_age):
+    """PREVIEW_SIZE copy of a layer file, resized on the fly and kept in memory."""
+    key = (path, digest, fmt)
+    data = _previews.get(key)
+    if data is None:
+        with Image.open(os.path.join(STATIC_PATH, path)) as im:
+            im = normalize(im, path.split('/', 1)[0])
+            data = encode(im.resize(PREVIEW_SIZE, Image.LANCZOS), fmt)
+        _previews.put(key, data)
+    resp = Response(data, mimetype=f'image/{fmt}')
+    resp.set_etag(f"{digest}-preview.{fmt}")
+    if max_age is None:
+        resp.cache_control.no_cache = True
+    else:
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+    resp.headers['Vary'] = 'Accept'
+    return resp.make_conditional(request)
+
+def media_part(path, digest, max_age):
+    """206 with at most MEDIA_CHUNK bytes for an open-ended range on a media file.
+
+    None for anything else (bounded ranges, If-Range by date, revalidations,
+    ranges past the end), which send_from_directory answers as usual.
+    """
+    rng = request.range
+    if not path.lower().endswith(MEDIA_EXTS) or rng is None or len(rng.ranges) != 1:
+        return None
+    start, stop = rng.ranges[0]
+    if stop is not None or start < 0 or digest is None:
+        return None
+    if request.if_none_match.contains(digest):
+        return None
+    if_range = request.if_range
+    if if_range.date is not None or (if_range.etag is not None and if_range.etag != digest):
+        return None
+    full = safe_join(STATIC_PATH, path)
+    st = os.stat(full)
+    if start >= st.st_size:
+        return None
+    stop = min(start + MEDIA_CHUNK, st.st_size)
+    with open(full, 'rb') as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    resp = Response(data, 206, mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    resp.content_range = ContentRange('bytes', start, stop, st.st_size)
+    resp.accept_ranges = 'bytes'
+    resp.last_modified = st.st_mtime
+    resp.set_etag(digest)
+    if max_age is None:
+        resp.cache_control.no_cache = True
+    else:
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+    return resp
+
+@app.route('/atlas/<size>/<layer>/<int:n>')
+def atlas_sheet(size, layer, n):
+    """One atlas sheet in the best format the client accepts.
+
+    Sheet URLs carry the sheet hash from the atlas map (?v=<hash>), which
+    makes them cacheable forever like fingerprinted layer URLs.
+    """
+    sheet = atlas_map.sheet(size, layer, n)
+    if sheet is None:
+        abort(404)
+    fmt = next(f for f in accepted_formats() if f in sheet['files'])
+    immutable = request.args.get('v') == sheet['hash']
+    resp = send_from_directory(
+        BUILD_PATH, sheet['files'][fmt], etag=f"{sheet['hash']}-{fmt}",
+        max_age=IMMUTABLE_MAX_AGE if immutable else None
     )
+    resp.headers['Vary'] = 'Accept'
+    if immutable:
+        resp.cache_control.immutable = True
+    return resp
 
 # serve static files
 @app.route('/static/<path:path>')
 def static_proxy(path):
-    return send_from_directory(STATIC_PATH, path)
+    """Serve a static file, or the best web variant of a layer file.
+
+    Layer URLs carry their content hash (?v=<hash>, see index.html); when it
+    matches, the response is cacheable forever. Everything else gets a strong
+    ETag and must revalidate, which answers 304 when unchanged. Range and
+    If-Range requests get 206 partial responses, streamed from disk.
+
+    ?size=preview is served from the pre-rendered thumbnails; a layer file
+    whose thumbnail is missing or older than the file is resized on the fly.
+    """
+    digest = manifest.file_hash(path)
+    immutable = digest is not None and request.args.get('v') == digest
+    # max_age=None makes send_file answer Cache-Control: no-cache
+    max_age = IMMUTABLE_MAX_AGE if immutable else None
+    size = request.args.get('size', 'full')
+    variant = asset_variants.best(path, size, accepted_formats(), digest)
+    part = media_part(path, digest, max_age)
+    if part is not None:
+        resp = part
+    elif variant is None and size == 'preview' and digest and manifest.is_layer_file(path):
+        fmt = 'webp' if 'webp' in accepted_formats() else 'png'
+        resp = preview_response(path, digest, fmt, max_age)
+    elif variant:
+        etag = f"{digest}-{variant}" if digest else True
+        resp = send_from_directory(BUILD_PATH, variant, etag=etag, max_age=max_age)
+        resp.headers['Vary'] = 'Accept'
+    else:
+        resp = send_from_directory(STATIC_PATH, path, etag=digest or True, max_age=max_age)
+    if immutable:
+        resp.cache_control.immutable = True
+    return resp
 
 if __name__ == '__main__':
+    manifest.watch()
     app.run(debug=True, host='0.0.0.0')
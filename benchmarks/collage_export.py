@@ -0,0 +1,129 @@
+"""
+collage_export.py — collage saves: one in-memory image vs tiled strips.
+
+Builds a collage like the editor does: a real background, blown up by
+`--upscale` to stand in for a big loaded image and saved at `--bg-scale`,
+with `--composites` seeded characters scattered over it at random scales.
+Then saves it two ways, each in its own process so peak memory is separate:
+
+  in-memory  what save_collage used to do: LANCZOS copy of the whole
+             background, paste every scaled composite, save_png
+  tiled      Collage.save: strips rendered and encoded on a thread pool,
+             streamed to the file (export.save_png_strips)
+
+Prints wall time, peak RSS above the pre-save baseline, file size, and
+how far the tiled pixels are from the in-memory ones.
+
+Run (from the repo root; Linux, for /proc and ru_maxrss):
+    python -m benchmarks.collage_export [--upscale 4] [--bg-scale 2] [--composites 40]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from collage import Collage
+from export import ExportSettings, save_png
+from pyramid import ScalePyramid
+
+Image.MAX_IMAGE_PIXELS = None
+OUT_DIR = os.path.join('build', 'bench')
+
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_collage(args):
+    import app as webapp
+    from render import composite
+    from sampler import RaritySampler
+
+    backgrounds = webapp.manifest.files()['background']
+    bg = Image.open(os.path.join(webapp.STATIC_PATH, 'background', backgrounds[0])).convert('RGBA')
+    bg = bg.resize((bg.width * args.upscale, bg.height * args.upscale), Image.LANCZOS)
+    bg_pyramid = ScalePyramid(bg)
+    width, height = bg_pyramid.size_at(args.bg_scale)
+
+    rng = random.Random(1)
+    sampler = RaritySampler([l for l in webapp.LAYER_ORDER if l not in ('background', 'health')],
+                            webapp.manifest.files())
+    placed = []
+    for traits in sampler.sample(rng, args.composites):
+        selection = [(layer, traits[layer]) for layer in webapp.LAYER_ORDER if layer in traits]
+        comp = composite(webapp.layer_store, selection, rng.getrandbits(32), webapp.IMAGE_SIZE)
+        placed.append((ScalePyramid(comp), rng.uniform(0, width), rng.uniform(0, height),
+                       round(rng.uniform(0.5, 2.0), 1)))
+    return bg_pyramid, placed
+
+
+def in_memory(bg_pyramid, bg_scale, placed, path, settings):
+    collage = bg_pyramid.get(bg_scale).copy()
+    for pyramid, x, y, scale in placed:
+        scaled_comp = pyramid.get(scale)
+        collage.paste(scaled_comp, (int(x - scaled_comp.width / 2),
+                                    int(y - scaled_comp.height / 2)), scaled_comp)
+    return save_png(collage, path, settings)
+
+
+def run_one(args):
+    """Child process: build the inputs, then time and measure one save."""
+    bg_pyramid, placed = make_collage(args)
+    path = os.path.join(OUT_DIR, f"collage-{args.mode}.png")
+    settings = ExportSettings(args.preset)
+    base = rss_mb()
+    start = time.perf_counter()
+    if args.mode == 'in-memory':
+        result = in_memory(bg_pyramid, args.bg_scale, placed, path, settings)
+    else:
+        result = Collage(bg_pyramid, args.bg_scale, placed).save(path, settings)
+    ms = (time.perf_counter() - start) * 1000
+    print(json.dumps({'ms': ms, 'peak_mb': peak_rss_mb() - base, 'bytes': result.nbytes,
+                      'size': bg_pyramid.size_at(args.bg_scale), 'path': path}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare in-memory and tiled collage saves.")
+    parser.add_argument('--upscale', type=int, default=4, help="background blow-up factor")
+    parser.add_argument('--bg-scale', type=float, default=2.0)
+    parser.add_argument('--composites', type=int, default=40)
+    parser.add_argument('--preset', default='fast')
+    parser.add_argument('--mode', choices=('in-memory', 'tiled'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.makedirs(OUT_DIR, exist_ok=True)
+    if args.mode:
+        return run_one(args)
+
+    results = {}
+    for mode in ('in-memory', 'tiled'):
+        cmd = [sys.executable, '-m', 'benchmarks.collage_export', '--mode', mode,
+               '--upscale', str(args.upscale), '--bg-scale', str(args.bg_scale),
+               '--composites', str(args.composites), '--preset', args.preset]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        results[mode] = json.loads(out.strip().splitlines()[-1])
+
+    w, h = results['tiled']['size']
+    print(f"{w}x{h} collage, {args.composites} composites, preset {args.preset}")
+    for mode, r in results.items():
+        print(f"  {mode:<10} {r['ms']:8.0f} ms   peak +{r['peak_mb']:7.0f} MB   "
+              f"{r['bytes'] / 2**20:6.1f} MB file")
+    a = np.asarray(Image.open(results['in-memory']['path']), dtype=np.int16)
+    b = np.asarray(Image.open(results['tiled']['path']), dtype=np.int16)
+    diff = np.abs(a - b)
+    print(f"  pixels differing: {(diff.max(axis=2) > 0).mean():.3%}, max difference {diff.max()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+index_rps.py — requests/sec for `/` before and after the cached layer manifest.
+
+"before" re-creates the old per-request listdir + sort + render (every other
+template variable comes from app.page_context, as for the real page);
+"after" hits the real `index()` route.
+
+Run (from the repo root):
+    python -m benchmarks.index_rps [seconds]
+"""
+import os
+import sys
+import time
+
+from flask import render_template
+
+import app as webapp
+from build_assets import SOURCE_EXTS
+
+
+def legacy_index():
+    layer_files = {}
+    for layer in webapp.LAYER_ORDER:
+        folder = os.path.join(webapp.STATIC_PATH, layer)
+        try:
+            files = sorted(f for f in os.listdir(folder) if f.lower().endswith(SOURCE_EXTS))
+        except FileNotFoundError:
+            files = []
+        layer_files[layer] = files
+    return render_template('index.html', **webapp.page_context(layer_files))
+
+
+def rps(client, path, seconds):
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        resp = client.get(path)
+        assert resp.status_code == 200, (path, resp.status_code)
+        n += 1
+    return n / (time.perf_counter() - start)
+
+
+def main(seconds=3.0):
+    webapp.app.add_url_rule('/__legacy_index', 'legacy_index', legacy_index)
+    client = webapp.app.test_client()
+    before = rps(client, '/__legacy_index', seconds)
+    after = rps(client, '/', seconds)
+    print(f"before: {before:8.1f} req/s")
+    print(f"after : {after:8.1f} req/s  ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 3.0)
@@ -0,0 +1,61 @@
+"""
+noise_bench.py — old per-pixel `add_noise` loop vs the vectorized noise module.
+
+Run (from the repo root):
+    python -m benchmarks.noise_bench [layer] [file]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import noise
+
+IMAGE_SIZE  = (790, 875)
+STATIC_PATH = 'static'
+
+
+def pixel_loop_noise(img, level):
+    # the original MyMilliosApp.add_noise
+    px = img.load()
+    for x in range(img.width):
+        for y in range(img.height):
+            r, g, b, a = px[x, y]
+            n = int((random.random() - 0.5) * level * 255)
+            px[x, y] = (
+                max(0, min(255, r + n)),
+                max(0, min(255, g + n)),
+                max(0, min(255, b + n)),
+                a
+            )
+    return img
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(layer='bodies', fname=None):
+    folder = os.path.join(STATIC_PATH, layer)
+    fname = fname or sorted(f for f in os.listdir(folder) if f.lower().endswith('.png'))[0]
+    img = Image.open(os.path.join(folder, fname)).convert('RGBA').resize(IMAGE_SIZE)
+    level = 0.4
+
+    loop = best_of(lambda: pixel_loop_noise(img.copy(), level), 1)
+    vec = best_of(lambda: noise.add_noise(img, level, np.random.default_rng(0)), 10)
+    print(f"{layer}/{fname} @ {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}")
+    print(f"pixel loop : {loop * 1000:9.1f} ms/layer")
+    print(f"vectorized : {vec * 1000:9.1f} ms/layer  ({loop / vec:.0f}x)")
+    print(f"11 layers  : {loop * 11:.2f} s -> {vec * 11 * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,122 @@
+"""
+phash_index.py — near-duplicate lookups at collection scale.
+
+Fills a phash.HashIndex with `items` hashes, then times `queries` lookups
+within `--radius` bits three ways:
+
+  index        HashIndex.near (multi-index hashing)
+  numpy scan   XOR + popcount over every stored hash as one uint64 array
+  python scan  hamming() against every stored hash
+
+Hashes come from real characters (generate.py's NearDuplicates: sampled
+traits, small unnoised render, phash) or, with --source random, from random
+64-bit values, half of the queries being planted near-copies. Prints build
+time, index memory (tracemalloc) and p50/p95 per query.
+
+Run (from the repo root):
+    python -m benchmarks.phash_index [--items 100000] [--radius 4] [--source render|random]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from phash import HashIndex, hamming
+
+
+def render_hashes(count, seed=1):
+    from config import LAYER_ORDER, STATIC_PATH
+    from generate import NearDuplicates
+    from manifest import LayerManifest
+    from sampler import RaritySampler
+
+    near = NearDuplicates(radius=0)
+    sampler = RaritySampler(LAYER_ORDER, LayerManifest(STATIC_PATH, LAYER_ORDER).files())
+    # repeats allowed: a collection this size can hold the same look twice
+    return [near.hash(traits) for traits in sampler.sample(random.Random(seed), count)]
+
+
+def random_hashes(count, seed=1):
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(count)]
+
+
+def near_copy(h, rng, bits):
+    for b in rng.sample(range(64), bits):
+        h ^= 1 << b
+    return h
+
+
+def percentiles(times):
+    ms = sorted(t * 1000 for t in times)
+    return ms[len(ms) // 2], ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+
+
+def timed_queries(fn, queries):
+    times, hits = [], 0
+    for q in queries:
+        start = time.perf_counter()
+        hits += len(fn(q)) > 0
+        times.append(time.perf_counter() - start)
+    return times, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time near-duplicate lookups over many hashes.")
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--radius', type=int, default=4)
+    parser.add_argument('--source', choices=('render', 'random'), default='render')
+    parser.add_argument('--python-scan', type=int, default=200,
+                        help="queries for the (slow) pure Python scan")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total = args.items + args.queries
+    hashes = render_hashes(total) if args.source == 'render' else random_hashes(total)
+    print(f"{total} {args.source} hashes in {time.perf_counter() - start:.1f}s")
+    stored, queries = hashes[:args.items], hashes[args.items:]
+    rng = random.Random(2)
+    if args.source == 'random':   # otherwise nearly every query would miss
+        queries[::2] = [near_copy(rng.choice(stored), rng, rng.randint(0, args.radius))
+                        for _ in queries[::2]]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = HashIndex(args.radius)
+    for h in stored:
+        index.add(h)
+    build_s = time.perf_counter() - start
+    index_mb = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    buckets = [len(b) for table in index._tables for b in table.values()]
+    print(f"index: {len(index)} hashes, radius {args.radius}, built in {build_s:.2f}s, "
+          f"{index_mb:.1f} MB, {len(buckets)} buckets (mean {np.mean(buckets):.1f}, "
+          f"max {max(buckets)})")
+
+    packed = np.array(stored, dtype=np.uint64)
+
+    def numpy_scan(q):
+        x = packed ^ np.uint64(q)
+        count = np.unpackbits(x.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+        return np.flatnonzero(count <= args.radius)
+
+    def python_scan(q):
+        return [n for n, h in enumerate(stored) if hamming(q, h) <= args.radius]
+
+    results = {
+        'index': timed_queries(index.near, queries),
+        'numpy scan': timed_queries(numpy_scan, queries[:args.python_scan * 5]),
+        'python scan': timed_queries(python_scan, queries[:args.python_scan]),
+    }
+    base = percentiles(results['index'][0])[0]
+    for name, (times, hits) in results.items():
+        p50, p95 = percentiles(times)
+        print(f"  {name:<12} p50 {p50:9.3f} ms  p95 {p95:9.3f} ms  ({p50 / base:7.0f}x)  "
+              f"{hits}/{len(times)} queries had a match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+range_bench.py — time-to-first-byte and bytes per seek for the playlist MP3s.
+
+Starts the Flask app on a local port and fetches each song the way an
+<audio> element does: once as a plain full GET (the old behaviour), then
+as an open-ended range from the start followed by seeks to 25/50/75%.
+
+Run (from the repo root):
+    python -m benchmarks.range_bench
+"""
+import http.client
+import logging
+import os
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import app as webapp
+
+SONGS = ['song1.mp3', 'song2.mp3', 'song3.mp3']
+
+
+def fetch(port, url, headers=None):
+    """(status, ttfb seconds, body bytes, total seconds)."""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    conn.request('GET', url, headers=headers or {})
+    resp = conn.getresponse()
+    first = resp.read(1)
+    ttfb = time.perf_counter() - start
+    body = first + resp.read()
+    total = time.perf_counter() - start
+    conn.close()
+    return resp.status, ttfb, len(body), total
+
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, webapp.app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for song in SONGS:
+            url = webapp.static_url(song)
+            size = os.path.getsize(os.path.join(webapp.STATIC_PATH, song))
+            status, ttfb, n, total = fetch(port, url)
+            print(f"{song}: {size / 2**20:.1f} MB")
+            print(f"  full GET     {status}  ttfb {ttfb * 1000:6.1f} ms  "
+                  f"{n / 1024:8.0f} KB  {total * 1000:6.1f} ms")
+            for frac in (0, 0.25, 0.5, 0.75):
+                offset = int(size * frac)
+                status, ttfb, n, total = fetch(port, url, {'Range': f'bytes={offset}-'})
+                print(f"  seek {frac:4.0%}    {status}  ttfb {ttfb * 1000:6.1f} ms  "
+                      f"{n / 1024:8.0f} KB  {total * 1000:6.1f} ms")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
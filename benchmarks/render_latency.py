@@ -0,0 +1,116 @@
+"""
+render_latency.py — per-roll render latency of the web noise paths, headless.
+
+Renders the same seeded combos three ways and prints p50/p95 per roll:
+
+  per-layer  what index.html used to do: noise every layer over the whole
+             canvas, then PNG-encode each layer (the toDataURL per <img>)
+  overlay    what it does now: draw the layers once, then add one repeating
+             noise tile over the composite; nothing is re-encoded
+  /render    the server path (`/render?id=...`), cold and warm cache
+
+The first two run the same work in numpy/Pillow that the browser does in
+JS/canvas, so the ratio is what to watch, not the absolute numbers.
+
+Run (from the repo root):
+    python -m benchmarks.render_latency [rolls] [--size preview|full]
+"""
+import argparse
+import io
+import random
+import time
+
+import numpy as np
+from PIL import Image
+
+import app as webapp
+import noise
+from render import WEB_NOISE_CENTER, WEB_NOISE_LEVEL
+from sampler import RaritySampler
+from traits import to_code
+
+
+def percentiles(times):
+    ms = sorted(t * 1000 for t in times)
+    return ms[len(ms) // 2], ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+
+
+def canvas_layers(store, traits, size):
+    """Each picked layer as a full canvas-sized RGBA image, bottom to top."""
+    out = []
+    for layer in webapp.LAYER_ORDER:
+        if layer in traits:
+            im = store.get(layer, traits[layer]).to_image()
+            out.append(im if im.size == size else im.resize(size, Image.BILINEAR))
+    return out
+
+
+def per_layer(layers, seed):
+    for layer_img in layers:
+        rng = np.random.default_rng(seed)
+        noised = noise.add_noise(layer_img, WEB_NOISE_LEVEL, rng, WEB_NOISE_CENTER)
+        noised.save(io.BytesIO(), 'PNG')
+
+
+def overlay(layers, seed, tiles):
+    canvas = Image.new('RGBA', layers[0].size, (0, 0, 0, 0))
+    for layer_img in layers:
+        canvas.alpha_composite(layer_img)
+    arr = np.asarray(canvas, dtype=np.int16).copy()
+    tile = tiles[seed % len(tiles)]
+    reps = (-(-arr.shape[0] // tile.shape[0]), -(-arr.shape[1] // tile.shape[1]))
+    offset = np.tile(tile, reps)[:arr.shape[0], :arr.shape[1]]
+    arr[..., :3] += offset[..., None]
+    np.clip(arr, 0, 255, out=arr)
+    return Image.fromarray(arr.astype(np.uint8), 'RGBA')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('rolls', type=int, nargs='?', default=30)
+    parser.add_argument('--size', choices=('preview', 'full'), default='preview')
+    args = parser.parse_args()
+
+    size = webapp.PREVIEW_SIZE if args.size == 'preview' else webapp.IMAGE_SIZE
+    layer_files = webapp.manifest.files()
+    rng = random.Random(1)
+    sampler = RaritySampler(webapp.LAYER_ORDER, layer_files)
+    rolls = [(traits, rng.getrandbits(32)) for traits in sampler.sample(rng, args.rolls)]
+    tiles = [np.asarray(noise.noise_tile(n, webapp.NOISE_TILE, WEB_NOISE_LEVEL, WEB_NOISE_CENTER),
+                        dtype=np.int16) - 128 for n in range(webapp.NOISE_TILES)]
+
+    store = webapp.layer_store
+    decoded = [(canvas_layers(store, traits, size), seed) for traits, seed in rolls]
+    results = {}
+    for name, fn in (('per-layer', per_layer),
+                     ('overlay', lambda l, s: overlay(l, s, tiles))):
+        times = []
+        for layers, seed in decoded:
+            start = time.perf_counter()
+            fn(layers, seed)
+            times.append(time.perf_counter() - start)
+        results[name] = times
+
+    client = webapp.app.test_client()
+    urls = [f"/render?id={to_code(webapp.trait_index.encode(traits, seed))}&w={size[0]}&fmt=webp"
+            for traits, seed in rolls]
+    for name in ('/render cold', '/render warm'):
+        if name.endswith('cold'):
+            webapp.render_cache.clear()
+        times = []
+        for url in urls:
+            start = time.perf_counter()
+            resp = client.get(url)
+            times.append(time.perf_counter() - start)
+            assert resp.status_code == 200, (url, resp.status_code)
+        results[name] = times
+
+    print(f"{len(rolls)} rolls at {size[0]}x{size[1]}")
+    base = percentiles(results['per-layer'])[0]
+    for name, times in results.items():
+        p50, p95 = percentiles(times)
+        print(f"  {name:<14} p50 {p50:8.1f} ms   p95 {p95:8.1f} ms   ({base / p50:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+site_latency.py — the page served by app.py vs the static build, cold and warm.
+
+Starts each mode as its own local server process:
+
+  flask   app.py under werkzeug (what every request paid when vercel.json
+          sent all paths to app.py)
+  static  build/site from build_site.py under `python -m http.server`, a
+          stand-in for a plain file host
+
+Cold start is spawn → first complete `/` response, i.e. interpreter start,
+imports and the first page render, as a fresh serverless instance would pay
+it. Per-request latency is then measured for the page, a preview layer
+variant, an atlas sheet and a noise tile, each through suite.load().
+
+Run (from the repo root, after `python build_site.py`):
+    python -m benchmarks.site_latency [--runs 5] [--seconds 2] [--concurrency 4]
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import app as webapp
+from benchmarks.suite import ACCEPT, load
+from build_site import SITE_PATH
+
+FLASK_CMD = ("import logging, sys; from werkzeug.serving import run_simple; import app; "
+             "logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+             "run_simple('127.0.0.1', int(sys.argv[1]), app.app, threaded=True)")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_cmd(mode, port):
+    if mode == 'flask':
+        return [sys.executable, '-c', FLASK_CMD, str(port)]
+    return [sys.executable, '-m', 'http.server', str(port), '--bind', '127.0.0.1',
+            '--directory', SITE_PATH]
+
+
+def first_response(port, deadline):
+    """Poll `/` until it answers 200; False if `deadline` passes first."""
+    while time.perf_counter() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/')
+            resp = conn.getresponse()
+            resp.read()
+            conn.close()
+            if resp.status == 200:
+                return True
+        except OSError:
+            time.sleep(0.005)
+    return False
+
+
+def start(mode, timeout=30.0):
+    """(process, port, cold start ms)."""
+    port = free_port()
+    began = time.perf_counter()
+    proc = subprocess.Popen(server_cmd(mode, port), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    if not first_response(port, began + timeout):
+        proc.kill()
+        raise RuntimeError(f"{mode} server did not answer within {timeout:.0f}s")
+    return proc, port, (time.perf_counter() - began) * 1000
+
+
+def stop(proc):
+    proc.terminate()
+    proc.wait()
+
+
+def targets(mode):
+    """The same four resources as each mode's page would request them."""
+    layer = next(l for l in webapp.LAYER_ORDER
+                 if l in webapp.atlas_map.client().get('preview', {}))
+    fname = webapp.manifest.files()[layer][0]
+    digest = webapp.manifest.hashes()[layer][fname]
+    sheet = webapp.atlas_map.client()['preview'][layer]['sheets'][0]
+    v = webapp.NOISE_INFO['v']
+    if mode == 'flask':
+        return {
+            'index': '/',
+            'layer': f"/static/{layer}/{fname}?v={digest}&size=preview",
+            'atlas_sheet': f"/atlas/preview/{layer}/0?v={sheet}",
+            'noise': f"/noise/0?v={v}",
+        }
+    return {
+        'index': '/',
+        'layer': f"/assets/{layer}/preview/{os.path.splitext(fname)[0]}.{digest}.webp",
+        'atlas_sheet': f"/assets/atlas/preview/{layer}-0.{sheet}.webp",
+        'noise': f"/assets/noise/0.{v}.png",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare app.py and the static build locally.")
+    parser.add_argument('--runs', type=int, default=5, help="cold starts per mode")
+    parser.add_argument('--seconds', type=float, default=2.0, help="load time per resource")
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+    if not os.path.exists(os.path.join(SITE_PATH, 'index.html')):
+        sys.exit(f"no {SITE_PATH}/index.html; run `python build_site.py` first")
+
+    for mode in ('flask', 'static'):
+        colds = []
+        for _ in range(args.runs):
+            proc, port, ms = start(mode)
+            colds.append(ms)
+            if len(colds) < args.runs:
+                stop(proc)
+        print(f"{mode}: cold start median {statistics.median(colds):7.1f} ms  "
+              f"(min {min(colds):.1f}, max {max(colds):.1f}, n={len(colds)})")
+        try:
+            for name, url in targets(mode).items():
+                s = load(port, url, {'Accept': ACCEPT}, args.seconds, args.concurrency)
+                print(f"  {name:<12} p50 {s.get('p50_ms', 0):8.2f} ms  p95 {s.get('p95_ms', 0):8.2f} ms  "
+                      f"{s['rps']:8.1f} req/s  errors={s['errors']}")
+        finally:
+            stop(proc)
+
+
+if __name__ == '__main__':
+    main()
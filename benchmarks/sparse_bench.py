@@ -0,0 +1,70 @@
+"""
+sparse_bench.py — full-canvas vs trimmed (SparseLayer) compositing.
+
+Loads every layer file once both ways, then composites the same random
+characters with `paste(im, (0, 0), im)` on full canvases and with
+`paste(crop, offset, crop)` on the trimmed crops.
+
+Run (from the repo root):
+    python -m benchmarks.sparse_bench [characters]
+"""
+import os
+import random
+import sys
+import time
+
+from PIL import Image
+
+from config import IMAGE_SIZE, LAYER_ORDER, STATIC_PATH
+from render import SparseLayer
+
+
+def load_layers():
+    dense, sparse = {}, {}
+    for layer in LAYER_ORDER:
+        folder = os.path.join(STATIC_PATH, layer)
+        if not os.path.isdir(folder):
+            continue
+        for fn in sorted(f for f in os.listdir(folder) if f.lower().endswith('.png')):
+            img = Image.open(os.path.join(folder, fn)).convert('RGBA')
+            if img.size != IMAGE_SIZE:
+                img = img.resize(IMAGE_SIZE, Image.LANCZOS)
+            dense.setdefault(layer, []).append(img)
+            sparse.setdefault(layer, []).append(SparseLayer.trim(img))
+    return dense, sparse
+
+
+def main(characters=200):
+    dense, sparse = load_layers()
+    rng = random.Random(0)
+    picks = [{layer: rng.randrange(len(files)) for layer, files in dense.items()}
+             for _ in range(characters)]
+
+    start = time.perf_counter()
+    for pick in picks:
+        comp = Image.new('RGBA', IMAGE_SIZE, (0, 0, 0, 0))
+        for layer, i in pick.items():
+            im = dense[layer][i]
+            comp.paste(im, (0, 0), im)
+    t_dense = (time.perf_counter() - start) / characters
+
+    start = time.perf_counter()
+    for pick in picks:
+        comp = Image.new('RGBA', IMAGE_SIZE, (0, 0, 0, 0))
+        for layer, i in pick.items():
+            s = sparse[layer][i]
+            comp.paste(s.image, s.offset, s.image)
+    t_sparse = (time.perf_counter() - start) / characters
+
+    print(f"composite per character: {t_dense * 1000:.2f} ms -> {t_sparse * 1000:.2f} ms "
+          f"({t_dense / t_sparse:.1f}x)")
+    print(f"{'layer':<14}{'files':>6}{'dense KB/layer':>16}{'sparse KB/layer':>17}")
+    for layer in dense:
+        n = len(dense[layer])
+        d = sum(im.width * im.height * 4 for im in dense[layer]) / n / 1024
+        s = sum(sl.nbytes for sl in sparse[layer]) / n / 1024
+        print(f"{layer:<14}{n:>6}{d:>16.0f}{s:>17.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,220 @@
+"""
+suite.py — reproducible benchmark suite: compositing stages and Flask routes.
+
+Stages: builds `rolls` seeded characters from the real static/ layers and
+LAYER_ORDER at preview size (PREVIEW_SIZE, i.e. PREVIEW_SCALE of the canvas)
+and at full IMAGE_SIZE, timing every stage through render.StageTimer:
+decode, convert, resize, trim, noise, paste, encode_png/webp. Each size has
+its own LayerStore holding layers at that size, so preview characters are
+built at preview size rather than scaled down from full. The first pass
+starts from an empty store (cold); the second reuses it.
+
+Routes: starts the app on a local port and drives `/`, a fingerprinted layer
+file (200 and 304), a cached `/render?id=` and an atlas sheet with `--concurrency`
+client threads for `--seconds` each.
+
+Everything lands in one JSON file (per-stage and per-route p50/p95 in ms,
+plus the commit and library versions), so two runs can be diffed:
+
+Run (from the repo root):
+    python -m benchmarks.suite [--out build/bench/<commit>.json]
+    python -m benchmarks.suite --compare build/bench/<old>.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+
+import numpy
+import PIL
+from werkzeug.serving import make_server
+
+import app as webapp
+from render import LayerStore, StageTimer, composite, encode
+from sampler import RaritySampler
+from traits import to_code
+
+SIZES = {'preview': webapp.PREVIEW_SIZE, 'full': webapp.IMAGE_SIZE}
+ACCEPT = 'image/avif,image/webp,*/*'
+REGRESSION = 0.10   # --compare flags p50s more than 10% slower
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def sample_rolls(count, seed=1):
+    rng = random.Random(seed)
+    sampler = RaritySampler(webapp.LAYER_ORDER, webapp.manifest.files())
+    return [(traits, rng.getrandbits(32)) for traits in sampler.sample(rng, count)]
+
+
+def bench_stages(rolls):
+    results = {}
+    for name, size in SIZES.items():
+        store = LayerStore(webapp.STATIC_PATH, size)
+        for phase in ('cold', 'warm'):
+            timer = StageTimer()
+            for traits, seed in rolls:
+                selection = [(layer, traits[layer]) for layer in webapp.LAYER_ORDER if layer in traits]
+                with timer('character'):
+                    img = composite(store, selection, seed, size, timer=timer)
+                    encode(img, 'png', timer)
+                encode(img, 'webp', timer)
+            results[f"{name}_{phase}"] = timer.summary()
+    return results
+
+
+def fetch(port, url, headers):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    try:
+        conn.request('GET', url, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    finally:
+        conn.close()
+
+
+def load(port, url, headers, seconds, concurrency):
+    """Hammer one URL from `concurrency` threads; latency stats in ms and req/s.
+
+    One untimed request first, so lazy loads and caches don't skew the numbers.
+    """
+    fetch(port, url, headers)
+    timer = StageTimer()
+    errors = []
+    stop = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < stop:
+            with timer('request'):
+                status = fetch(port, url, headers)
+            if status >= 400:
+                errors.append(status)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = timer.summary().get('request', {'n': 0})
+    stats['rps'] = round(stats['n'] / (time.perf_counter() - start), 1)
+    stats['errors'] = len(errors)
+    return stats
+
+
+def route_targets(rolls):
+    layer = next(l for l in webapp.LAYER_ORDER if webapp.manifest.files().get(l))
+    fname = webapp.manifest.files()[layer][0]
+    layer_url = f"/static/{layer}/{fname}?v={webapp.manifest.hashes()[layer][fname]}"
+    traits, seed = rolls[0]
+    targets = {
+        'index': ('/', {}),
+        'layer_200': (layer_url, {'Accept': ACCEPT}),
+        'render_cached': (f"/render?id={to_code(webapp.trait_index.encode(traits, seed))}"
+                   f"&w={webapp.PREVIEW_SIZE[0]}", {'Accept': ACCEPT}),
+    }
+    with webapp.app.test_client() as c:
+        etag = c.get(layer_url, headers={'Accept': ACCEPT}).headers.get('ETag')
+    targets['layer_304'] = (layer_url, {'Accept': ACCEPT, 'If-None-Match': etag})
+    for atlas_layer, info in webapp.atlas_map.client().get('preview', {}).items():
+        targets['atlas_sheet'] = (f"/atlas/preview/{atlas_layer}/0?v={info['sheets'][0]}",
+                                  {'Accept': ACCEPT})
+        break
+    return targets
+
+
+def bench_routes(rolls, seconds, concurrency):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, webapp.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        return {name: load(server.server_port, url, headers, seconds, concurrency)
+                for name, (url, headers) in route_targets(rolls).items()}
+    finally:
+        server.shutdown()
+
+
+def flatten(result):
+    """{'stages/preview_cold/noise': p50_ms, 'routes/index': p50_ms, ...}."""
+    flat = {}
+    for group, stages in result.get('stages', {}).items():
+        for stage, stats in stages.items():
+            flat[f"stages/{group}/{stage}"] = stats['p50_ms']
+    for name, stats in result.get('routes', {}).items():
+        if 'p50_ms' in stats:
+            flat[f"routes/{name}"] = stats['p50_ms']
+    return flat
+
+
+def compare(new, old):
+    """Print p50 changes between two result files, flagging regressions."""
+    before = flatten(old)
+    for key, now in flatten(new).items():
+        if not before.get(key):
+            continue
+        change = now / before[key] - 1
+        flag = '  <-- slower' if change > REGRESSION else ''
+        print(f"{key:<32} {before[key]:9.2f} -> {now:9.2f} ms ({change:+.0%}){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time compositing stages and Flask routes.")
+    parser.add_argument('--rolls', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=2.0, help="load time per route")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--out', default=None, help="default: build/bench/<commit>.json")
+    parser.add_argument('--compare', default=None, help="earlier result file to diff against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    rolls = sample_rolls(args.rolls)
+    result = {
+        'meta': {
+            'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'numpy': numpy.__version__,
+            'cpus': os.cpu_count(),
+            'rolls': len(rolls),
+            'seconds': args.seconds,
+            'concurrency': args.concurrency,
+        },
+        'stages': bench_stages(rolls),
+        'routes': bench_routes(rolls, args.seconds, args.concurrency),
+    }
+
+    for group, stages in result['stages'].items():
+        print(group)
+        for stage, s in stages.items():
+            print(f"  {stage:<12} p50 {s['p50_ms']:9.2f} ms  p95 {s['p95_ms']:9.2f} ms  n={s['n']}")
+    print('routes')
+    for name, s in result['routes'].items():
+        print(f"  {name:<14} p50 {s.get('p50_ms', 0):9.2f} ms  p95 {s.get('p95_ms', 0):9.2f} ms  "
+              f"{s['rps']:8.1f} req/s  errors={s['errors']}")
+
+    out = args.out or os.path.join('build', 'bench', f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=1)
+    print(f"wrote {out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""
+build_assets.py — parallel, incremental asset build (replaces pad-images.py).
+
+Reads every image in the LAYER_ORDER folders under static/ and writes the normalized PNG to
+build/static/<layer>/:
+    background/*.png|*.jpg  → stretched to NEW_SIZE (JPGs become PNGs)
+    every other layer       → padded onto a transparent NEW_SIZE canvas,
+                              unless it is already NEW_SIZE
+plus web variants of it for each size in SIZES and format in FORMATS:
+    <layer>/<name>.png|.webp|.avif             full size
+    <layer>/preview/<name>.png|.webp|.avif     PREVIEW_SIZE
+
+Layers other than ATLAS_SKIP are also packed into atlas sheets per size, so
+the web page fetches one image per layer instead of one per file:
+    atlas/<size>/<layer>-<n>.png|.webp|.avif
+with frame offsets in build/static/atlas.json (served as the `atlas` map).
+
+Sources are never modified. build/static/manifest.json records the content
+hash of each source; files whose hash (and the build settings) are unchanged
+are skipped, so a re-run after adding one file only processes that file.
+Work is fanned out over a process pool and every output is written to a temp
+file and renamed into place.
+
+`--formats` limits the build to some of FORMATS (png is always built: the
+atlases and thumbnails are made from it); build_site.py builds only the
+formats the static site ships. Outputs in other formats that an earlier build
+wrote are kept, and a later build only encodes the formats still missing.
+
+Run:
+    python build_assets.py [--workers N] [--force] [--formats png,webp]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, features
+
+from config import LAYER_ORDER
+
+STATIC_PATH = 'static'
+BUILD_PATH  = os.path.join('build', 'static')
+ORIG_SIZE   = (725, 875)
+NEW_SIZE    = (790, 875)
+SHIFT_RIGHT = 30  # uniform rightward shift for all non-background layers
+SOURCE_EXTS = ('.png', '.jpg', '.jpeg')
+MANIFEST    = 'manifest.json'
+ATLAS       = 'atlas.json'
+ATLAS_SKIP  = ('background',)   # full-bleed, so packing saves nothing
+ATLAS_MAX   = 4096              # sheet edge cap; bigger layers get more sheets
+ATLAS_PAD   = 2                 # gap between frames so lossy formats don't bleed
+
+PREVIEW_SIZE = (316, 350)  # NEW_SIZE * PREVIEW_SCALE (0.4), as in test.py
+SIZES = {'full': NEW_SIZE, 'preview': PREVIEW_SIZE}
+# encoder settings per format; AVIF only when Pillow was built with it
+FORMATS = {
+    'png':  {'format': 'PNG', 'optimize': True},
+    'webp': {'format': 'WEBP', 'quality': 85, 'method': 6},
+}
+if features.check('avif'):
+    FORMATS['avif'] = {'format': 'AVIF', 'quality': 60, 'speed': 6}
+
+# bump when the processing below changes, to invalidate every manifest entry
+PIPELINE_VERSION = 2
+# what normalize() depends on; consumers that normalize on the fly key caches by it
+NORMALIZE = f"{ORIG_SIZE}:{NEW_SIZE}:{SHIFT_RIGHT}"
+SETTINGS = f"v{PIPELINE_VERSION}:{NORMALIZE}:{SIZES}:{FORMATS}"
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def save_atomic(img, dest, **params):
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    img.save(tmp, format=params.pop('format', 'PNG'), **params)
+    os.replace(tmp, dest)
+
+
+def normalize(img, layer):
+    """Bring one layer image to NEW_SIZE the way pad-images.py did.
+
+    Also used directly by everything that reads static/ (LayerStore,
+    LayerCache, app.py previews), so raw and built files line up.
+    """
+    img = img.convert('RGBA')
+    if layer == 'background':
+        # stretch backgrounds to exactly NEW_SIZE
+        return img if img.size == NEW_SIZE else img.resize(NEW_SIZE, Image.LANCZOS)
+    if img.size == NEW_SIZE:
+        # already padded; don't shift it twice
+        return img
+    # base center-X and bottom-align Y, plus the uniform right-shift
+    offset_x = (NEW_SIZE[0] - ORIG_SIZE[0]) // 2 + SHIFT_RIGHT
+    offset_y = NEW_SIZE[1] - ORIG_SIZE[1]
+    canvas = Image.new('RGBA', NEW_SIZE, (0, 0, 0, 0))
+    canvas.paste(img, (offset_x, offset_y), img)
+    return canvas
+
+
+def variant_path(layer, name, size, fmt):
+    sub = f"{layer}/" if size == 'full' else f"{layer}/{size}/"
+    return f"{sub}{name}.{fmt}"
+
+
+def process(job):
+    """Build one source file's outputs in `formats`; returns (rel, {'size.fmt': path})."""
+    rel, src, out_dir, formats = job
+    layer = rel.split('/', 1)[0]
+    name = os.path.splitext(os.path.basename(rel))[0]
+    with Image.open(src) as im:
+        full = normalize(im, layer)
+    outputs = {}
+    for size, dims in SIZES.items():
+        img = full if dims == full.size else full.resize(dims, Image.LANCZOS)
+        for fmt in formats:
+            dest_rel = variant_path(layer, name, size, fmt)
+            save_atomic(img, os.path.join(out_dir, dest_rel), **FORMATS[fmt])
+            outputs[f"{size}.{fmt}"] = dest_rel
+    return rel, outputs
+
+
+def find_sources(static_path, layers=LAYER_ORDER):
+    """{'layer/file.ext': path} for every image in the `layers` folders under static/."""
+    sources = {}
+    for layer in sorted(layers):
+        folder = os.path.join(static_path, layer)
+        if not os.path.isdir(folder):
+            continue
+        for fn in sorted(os.listdir(folder)):
+            if fn.lower().endswith(SOURCE_EXTS):
+                sources[f"{layer}/{fn}"] = os.path.join(folder, fn)
+    return sources
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return manifest.get('files', {}) if manifest.get('settings') == SETTINGS else {}
+
+
+def save_manifest(out_dir, files):
+    path = os.path.join(out_dir, MANIFEST)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'settings': SETTINGS, 'files': files}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def build_formats(formats):
+    """`formats` (None for all of FORMATS) in FORMATS order, always with png."""
+    if formats is None:
+        return tuple(FORMATS)
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"unknown formats: {', '.join(sorted(unknown))} (have {', '.join(FORMATS)})")
+    return tuple(fmt for fmt in FORMATS if fmt == 'png' or fmt in formats)
+
+
+def build(static_path=STATIC_PATH, out_dir=BUILD_PATH, workers=None, force=False, formats=None):
+    start = time.perf_counter()
+    formats = build_formats(formats)
+    os.makedirs(out_dir, exist_ok=True)
+    old = {} if force else load_manifest(out_dir)
+    sources = find_sources(static_path)
+
+    files, todo = {}, []
+    for rel, src in sources.items():
+        st = os.stat(src)
+        entry = old.get(rel)
+        # cheap stat check first; hash only files whose stat changed
+        if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            digest = entry['hash']
+        else:
+            digest = file_hash(src)
+        if entry and entry['hash'] == digest:
+            # unchanged source: keep what is on disk, encode only missing formats
+            outputs = {k: o for k, o in entry['outputs'].items()
+                       if os.path.exists(os.path.join(out_dir, o))}
+            files[rel] = dict(entry, mtime=st.st_mtime_ns, size=st.st_size, outputs=outputs)
+            missing = tuple(fmt for fmt in formats
+                            if any(f"{size}.{fmt}" not in outputs for size in SIZES))
+            if missing:
+                todo.append((rel, src, out_dir, missing))
+            continue
+        files[rel] = {'hash': digest, 'mtime': st.st_mtime_ns, 'size': st.st_size, 'outputs': {}}
+        todo.append((rel, src, out_dir, formats))
+
+    if todo:
+        with ProcessPoolExecutor(workers) as pool:
+            for rel, outputs in pool.map(process, todo, chunksize=4):
+                files[rel]['outputs'].update(outputs)
+                print(f" built {rel}")
+
+    # drop outputs of sources that were deleted or renamed
+    live = {o for entry in files.values() for o in entry['outputs'].values()}
+    for rel, entry in old.items():
+        for o in entry['outputs'].values():
+            if o not in live and os.path.exists(os.path.join(out_dir, o)):
+                os.remove(os.path.join(out_dir, o))
+
+    save_manifest(out_dir, files)
+    elapsed = time.perf_counter() - start
+    print(f"{len(todo)} built, {len(sources) - len(todo)} up to date in {elapsed * 1000:.0f} ms")
+    return files
+
+
+def pack_shelves(sizes, max_w=ATLAS_MAX, max_h=ATLAS_MAX, pad=ATLAS_PAD):
+    """Shelf-pack (w, h) rects, tallest first.
+
+    Returns ([(sheet, x, y)] in input order, [(sheet_w, sheet_h)]).
+    """
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    # aim for a roughly square sheet, capped at max_w
+    area = sum((w + pad) * (h + pad) for w, h in sizes)
+    widest = max((w for w, _ in sizes), default=0)
+    width = min(max_w, max(widest, int(area ** 0.5)))
+    places = [None] * len(sizes)
+    sheets = []
+    x = y = shelf_h = used_w = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > width:
+            x, y = 0, y + shelf_h + pad
+            shelf_h = 0
+        if y + h > max_h:
+            sheets.append((used_w, y - pad))
+            x = y = shelf_h = used_w = 0
+        places[i] = (len(sheets), x, y)
+        x += w + pad
+        shelf_h = max(shelf_h, h)
+        used_w = max(used_w, x - pad)
+    sheets.append((used_w, y + shelf_h))
+    return places, sheets
+
+
+def build_atlas(job):
+    """Pack one layer at one size; returns (layer, size, {'sheets', 'frames'})."""
+    layer, size, frames_src, out_dir, key, formats = job
+    canvas = SIZES[size]
+    trimmed = []
+    for fname, src_hash, rel in frames_src:
+        with Image.open(os.path.join(out_dir, rel)) as im:
+            im = im.convert('RGBA')
+        box = im.getbbox() or (0, 0, 1, 1)
+        trimmed.append((fname, src_hash, box, im.crop(box)))
+    places, sheet_sizes = pack_shelves([t[3].size for t in trimmed])
+
+    sheets = [Image.new('RGBA', (max(w, 1), max(h, 1)), (0, 0, 0, 0)) for w, h in sheet_sizes]
+    frames = {}
+    for (fname, src_hash, box, img), (n, x, y) in zip(trimmed, places):
+        sheets[n].paste(img, (x, y))
+        # [sheet, sx, sy, w, h, dx, dy, source hash]; dx/dy place it on the canvas
+        frames[fname] = [n, x, y, img.width, img.height, box[0], box[1], src_hash[:10]]
+
+    out = []
+    for n, sheet in enumerate(sheets):
+        files = {}
+        for fmt in formats:
+            rel = f"atlas/{size}/{layer}-{n}.{fmt}"
+            save_atomic(sheet, os.path.join(out_dir, rel), **FORMATS[fmt])
+            files[fmt] = rel
+        out.append({'files': files, 'hash': f"{key[:8]}{n:02x}", 'size': sheet.size})
+    return layer, size, {'canvas': canvas, 'sheets': out, 'frames': frames}
+
+
+def build_atlases(files, out_dir=BUILD_PATH, workers=None, force=False, formats=None):
+    """Rebuild the atlas of every layer whose source files changed or lacks one of `formats`."""
+    formats = build_formats(formats)
+    path = os.path.join(out_dir, ATLAS)
+    try:
+        with open(path) as f:
+            old = json.load(f)
+    except (FileNotFoundError, ValueError):
+        old = {}
+    old_layers = old.get('layers', {}) if old.get('settings') == SETTINGS and not force else {}
+
+    by_layer = {}
+    for rel, entry in sorted(files.items()):
+        layer, fname = rel.split('/', 1)
+        if layer not in ATLAS_SKIP and '/' not in fname and 'full.png' in entry['outputs']:
+            by_layer.setdefault(layer, []).append((fname, entry))
+
+    layers, todo = {}, []
+    for layer, entries in by_layer.items():
+        key = hashlib.sha1(repr([(f, e['hash']) for f, e in entries]).encode()).hexdigest()
+        prev = old_layers.get(layer)
+        if prev and prev['key'] == key and all(
+            fmt in sheet['files'] and os.path.exists(os.path.join(out_dir, sheet['files'][fmt]))
+            for atlas in prev['sizes'].values() for sheet in atlas['sheets'] for fmt in formats
+        ):
+            layers[layer] = prev
+            continue
+        layers[layer] = {'key': key, 'sizes': {}}
+        for size in SIZES:
+            frames_src = [(f, e['hash'], e['outputs'][f'{size}.png']) for f, e in entries]
+            todo.append((layer, size, frames_src, out_dir, key, formats))
+
+    if todo:
+        with ProcessPoolExecutor(workers) as pool:
+            for layer, size, atlas in pool.map(build_atlas, todo):
+                layers[layer]['sizes'][size] = atlas
+                print(f" packed {layer} {size}: {len(atlas['frames'])} frames "
+                      f"in {len(atlas['sheets'])} sheet(s)")
+
+    # drop sheets that are no longer referenced
+    live = {rel for info in layers.values() for atlas in info['sizes'].values()
+            for sheet in atlas['sheets'] for rel in sheet['files'].values()}
+    for info in old.get('layers', {}).values():
+        for atlas in info.get('sizes', {}).values():
+            for sheet in atlas['sheets']:
+                for rel in sheet['files'].values():
+                    if rel not in live and os.path.exists(os.path.join(out_dir, rel)):
+                        os.remove(os.path.join(out_dir, rel))
+
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'settings': SETTINGS, 'layers': layers}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    return layers
+
+
+def report(files, out_dir=BUILD_PATH):
+    """Print source bytes vs the smallest full-size and preview variant, per layer."""
+    totals = {}
+    for rel, entry in files.items():
+        layer = rel.split('/', 1)[0]
+        t = totals.setdefault(layer, {'n': 0, 'src': 0, 'full': 0, 'preview': 0})
+        t['n'] += 1
+        t['src'] += entry['size']
+        for size in SIZES:
+            t[size] += min(
+                os.path.getsize(os.path.join(out_dir, path))
+                for key, path in entry['outputs'].items() if key.startswith(size + '.')
+            )
+    mb = 2**20
+    print(f"{'layer':<14}{'files':>6}{'source MB':>11}{'best full':>11}{'saved':>8}{'best prev':>11}")
+    for layer, t in sorted(totals.items()):
+        saved = 1 - t['full'] / t['src'] if t['src'] else 0
+        print(f"{layer:<14}{t['n']:>6}{t['src'] / mb:>11.2f}{t['full'] / mb:>11.2f}"
+              f"{saved:>8.0%}{t['preview'] / mb:>11.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build normalized layer assets into build/static.")
+    parser.add_argument('--src', default=STATIC_PATH)
+    parser.add_argument('--out', default=BUILD_PATH)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="rebuild everything")
+    parser.add_argument('--formats', type=lambda s: s.split(','), default=None,
+                        help=f"comma-separated subset of {','.join(FORMATS)} (default: all)")
+    args = parser.parse_args()
+    try:
+        build_formats(args.formats)
+    except ValueError as e:
+        parser.error(str(e))
+    files = build(args.src, args.out, args.workers, args.force, args.formats)
+    build_atlases(files, args.out, args.workers, args.force, args.formats)
+    report(files, args.out)
+
+
+if __name__ == '__main__':
+    main()
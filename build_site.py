@@ -0,0 +1,178 @@
+"""
+build_site.py — ahead-of-time static build of the web page.
+
+index() only renders a template from the layer listing, so the page can be
+rendered once at build time and served as a plain file instead of running
+app.py on every view. This writes build/site/:
+
+    index.html                                          manifest, registry and atlas map baked in
+    assets/xp.<hash>.css, assets/song1.<hash>.mp3, ...  files the template links
+    assets/<layer>/<size>/<name>.<hash>.webp|.png       layer variants (hash of the source)
+    assets/atlas/<size>/<layer>-<n>.<hash>.webp|.png    atlas sheets
+    assets/noise/<n>.<v>.png                            noise tiles
+
+Every asset name carries its content hash, so a host can serve assets/
+immutable. A plain file can't negotiate its format, so the page uses WebP
+when the browser decodes it and PNG otherwise. Only /render and /export.zip
+still need app.py. On Vercel, package.json's `vercel-build` script runs this
+and build/site is served as static files, with everything else falling
+through to app.py (see vercel.json).
+
+The asset build (build_assets.py) runs first, limited to SITE_FORMATS, and
+is incremental; outputs are hard-linked from build/static when possible, and
+files left from earlier builds that the page no longer references are
+removed.
+
+Run (from the repo root):
+    python build_site.py [--out build/site] [--workers N]
+"""
+import argparse
+import os
+import shutil
+import time
+
+from flask import render_template
+
+import app as webapp
+from build_assets import BUILD_PATH, SIZES, build, build_atlases
+from manifest import AtlasMap
+from noise import noise_tile
+from render import WEB_NOISE_CENTER, WEB_NOISE_LEVEL, encode
+
+SITE_PATH    = os.path.join('build', 'site')
+ASSETS       = 'assets'
+SITE_FORMATS = ('webp', 'png')   # what the page can ask for without Accept negotiation
+
+
+def fingerprinted(path, digest):
+    """'bodies/basic.png', 'ab12' → 'bodies/basic.ab12.png'."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+class SiteWriter:
+    """Writes files under the output dir and remembers them for prune()."""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.written = set()
+        self.nbytes = 0
+
+    def _dest(self, rel):
+        self.written.add(rel)
+        dest = os.path.join(self.out_dir, rel)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        return dest
+
+    def copy(self, src, rel):
+        """Hard-link (or copy) `src` to `rel`, replacing what was there."""
+        dest = self._dest(rel)
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+        self.nbytes += os.path.getsize(dest)
+
+    def write(self, rel, data):
+        dest = self._dest(rel)
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, dest)
+        self.nbytes += len(data)
+
+    def prune(self):
+        """Delete files from earlier builds that this one didn't write."""
+        removed = 0
+        for root, _, files in os.walk(self.out_dir):
+            for name in files:
+                rel = os.path.relpath(os.path.join(root, name), self.out_dir).replace(os.sep, '/')
+                if rel not in self.written:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+
+def static_file_url(writer):
+    """Stand-in for app.static_url: copies the file into assets/ under its hash."""
+    def url(path):
+        digest = webapp.manifest.file_hash(path)
+        if digest is None:
+            raise FileNotFoundError(os.path.join(webapp.STATIC_PATH, path))
+        rel = f"{ASSETS}/{fingerprinted(path, digest)}"
+        writer.copy(os.path.join(webapp.STATIC_PATH, path), rel)
+        return f"/{rel}"
+    return url
+
+
+def copy_layers(writer, files, layer_files, build_dir):
+    """Every layer file's variants, named as index.html's layerUrl() expects."""
+    hashes = webapp.manifest.hashes()
+    for layer, fnames in layer_files.items():
+        for fname in fnames:
+            entry = files.get(f"{layer}/{fname}")
+            digest = hashes[layer][fname]
+            if entry is None or not entry['hash'].startswith(digest):
+                raise RuntimeError(f"{layer}/{fname}: no up-to-date build output")
+            stem = os.path.splitext(fname)[0]
+            for size in SIZES:
+                for fmt in SITE_FORMATS:
+                    writer.copy(os.path.join(build_dir, entry['outputs'][f"{size}.{fmt}"]),
+                                f"{ASSETS}/{layer}/{size}/{stem}.{digest}.{fmt}")
+
+
+def copy_atlases(writer, atlas, build_dir):
+    for size, layers in atlas.index().items():
+        for layer, info in layers.items():
+            for n, sheet in enumerate(info['sheets']):
+                for fmt in SITE_FORMATS:
+                    writer.copy(os.path.join(build_dir, sheet['files'][fmt]),
+                                f"{ASSETS}/atlas/{size}/{layer}-{n}.{sheet['hash']}.{fmt}")
+
+
+def write_noise(writer):
+    for n in range(webapp.NOISE_TILES):
+        tile = noise_tile(n, webapp.NOISE_TILE, WEB_NOISE_LEVEL, WEB_NOISE_CENTER)
+        writer.write(f"{ASSETS}/noise/{n}.{webapp.NOISE_INFO['v']}.png", encode(tile, 'png'))
+
+
+def build_site(out_dir=SITE_PATH, build_dir=BUILD_PATH, workers=None):
+    """Build the assets, then the static site. Returns the SiteWriter."""
+    # only what the site copies: a cold build skips AVIF, the slowest encoder
+    files = build(webapp.STATIC_PATH, build_dir, workers, formats=SITE_FORMATS)
+    build_atlases(files, build_dir, workers, formats=SITE_FORMATS)
+    atlas = AtlasMap(build_dir)
+
+    writer = SiteWriter(out_dir)
+    layer_files = webapp.manifest.files()
+    webapp.trait_index.sync(layer_files)
+    copy_layers(writer, files, layer_files, build_dir)
+    copy_atlases(writer, atlas, build_dir)
+    write_noise(writer)
+
+    context = webapp.page_context(layer_files, static_site=True)
+    context['atlas'] = atlas.client()
+    with webapp.app.test_request_context('/'):
+        page = render_template('index.html', static_url=static_file_url(writer), **context)
+    writer.write('index.html', page.encode())
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the web page and its assets as static files.")
+    parser.add_argument('--out', default=SITE_PATH)
+    parser.add_argument('--build', default=BUILD_PATH, help="asset build dir (build_assets.py --out)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    writer = build_site(args.out, args.build, args.workers)
+    removed = writer.prune()
+    print(f"{args.out}: {len(writer.written)} files, {writer.nbytes / 2**20:.1f} MB "
+          f"({removed} stale removed) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
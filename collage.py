@@ -0,0 +1,53 @@
+"""
+collage.py — tiled collage rendering for the collage editor's saves.
+
+A collage is the background at `bg_scale` with every placed composite
+pasted over it, centred on its (x, y), in placement order. Building it as
+one image means a LANCZOS copy of the whole background plus a scaled copy
+of every composite, all in memory at once. `Collage.render(top, bottom)`
+builds just rows [top, bottom): it resizes only those rows of the
+background and of the composites that reach into them (see
+ScalePyramid.rows), so `save` can stream strips to the PNG encoder
+(export.save_png_strips) on a thread pool in bounded memory.
+"""
+import export
+
+
+class Collage:
+    def __init__(self, bg_pyramid, bg_scale, placed):
+        """`placed` is [(ScalePyramid, x, y, scale), ...], bottom to top."""
+        self.background = bg_pyramid
+        self.bg_scale = bg_scale
+        self.size = bg_pyramid.size_at(bg_scale)
+        self.items = []   # (pyramid, scale, paste x, paste y, scaled height)
+        for pyramid, x, y, scale in placed:
+            w, h = pyramid.size_at(scale)
+            self.items.append((pyramid, scale, int(x - w / 2), int(y - h / 2), h))
+
+    def render(self, top, bottom):
+        """RGBA rows [top, bottom) of the collage."""
+        strip = self.background.rows(self.bg_scale, top, bottom)
+        if strip.mode != 'RGBA':
+            strip = strip.convert('RGBA')
+        for pyramid, scale, px, py, h in self.items:
+            lo, hi = max(top, py), min(bottom, py + h)
+            if lo >= hi:
+                continue
+            comp = pyramid.rows(scale, lo - py, hi - py)
+            strip.paste(comp, (px, lo - top), comp)
+        return strip
+
+    def image(self):
+        """The whole collage as one image."""
+        return self.render(0, self.size[1])
+
+    def save(self, path, settings=None, workers=export.EXPORT_WORKERS):
+        """Write the collage as PNG; strip by strip unless a palette was asked for.
+
+        A palette PNG needs every pixel to count colours, so that case still
+        builds the whole image. Returns an ExportResult.
+        """
+        settings = settings or export.ExportSettings()
+        if settings.palette:
+            return export.save_png(self.image(), path, settings)
+        return export.save_png_strips(path, self.size, self.render, settings, workers)
@@ -0,0 +1,25 @@
+"""
+config.py — layer settings shared by the web app and the command-line tools.
+
+Kept free of imports with side effects, so generate.py, sampler.py and
+their process-pool workers can read the layer order without importing the
+Flask app (which lists and hashes every static file at import).
+"""
+
+# ─── CONFIG ─────────────────────────────────────────────────────
+IMAGE_SIZE  = (790, 875)
+STATIC_PATH = 'static'
+LAYER_ORDER = [
+    'background',
+    'accessories2',   # ← new behind bodies, in front of background
+    'bodies',
+    'eyes',
+    'mouth',
+    'shirts',
+    'hairs',
+    'earrings',
+    'toys',
+    'accessories',
+    'health',         # ← overlays everything at 30% opacity
+]
+# ─────────────────────────────────────────────────────────────────
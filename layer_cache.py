@@ -0,0 +1,134 @@
+"""
+layer_cache.py — persistent cache of decoded layer pixels.
+
+Each source image is decoded once, normalized like the asset build
+(build_assets.normalize, so it lines up with build/static), and stored as
+.npy arrays (full size and preview size) under the cache dir, both trimmed
+to the layer's non-transparent bounding box; a small `.box.npy` per size
+holds where the crop sits on its canvas. Entries are keyed by path, mtime,
+file size, preview size and the normalize settings, so an edited or
+replaced file simply misses and is re-processed. Warm loads memory-map the
+arrays, skipping decode and resize.
+`prune` keeps both sizes of every file loaded since the last prune, so
+full-size entries survive a session that only loaded previews.
+
+The two sizes are built independently. A preview miss first asks
+`thumbnails(path)` for a pre-rendered thumbnail (build_assets.py writes
+them) and decodes that small file; only when there is none, or it has the
+wrong size, is the full source decoded, normalized and resized.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+from PIL import Image
+
+from build_assets import NORMALIZE, normalize
+from render import SparseLayer
+
+CACHE_DIR = '.layer-cache'
+
+
+def _normalized(path):
+    """`path` (static/<layer>/<file>) padded or stretched like the asset build."""
+    with Image.open(path) as im:
+        return normalize(im, os.path.basename(os.path.dirname(path)))
+
+
+class LayerCache:
+    def __init__(self, cache_dir=CACHE_DIR, thumbnails=None):
+        self.cache_dir = cache_dir
+        self.thumbnails = thumbnails  # path → thumbnail path or None
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = self.misses = self.thumbnail_hits = 0
+        self._used = set()   # (path, preview_size) loaded since the last prune
+        self._locks = {}     # entry path → lock, so one thread builds a missing entry
+        self._locks_lock = threading.Lock()
+
+    KINDS = ('prev', 'full')
+
+    def _key(self, path, preview_size):
+        st = os.stat(path)
+        raw = (f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}:"
+               f"{preview_size[0]}x{preview_size[1]}:{NORMALIZE}")
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _paths(self, path, preview_size, kind):
+        base = os.path.join(self.cache_dir, f"{self._key(path, preview_size)}.{kind}")
+        return base + '.npy', base + '.box.npy'
+
+    def _entry(self, path, preview_size, kind, build):
+        paths = self._paths(path, preview_size, kind)
+        self._used.add((path, tuple(preview_size)))
+        with self._locks_lock:
+            lock = self._locks.setdefault(paths[0], threading.Lock())
+        with lock:
+            if all(os.path.exists(p) for p in paths):
+                self.hits += 1
+            else:
+                layer = build()
+                box = np.array(layer.offset + layer.size, dtype=np.int32)
+                for arr, dest in ((np.asarray(layer.image), paths[0]), (box, paths[1])):
+                    # unique temp name: other processes may share the cache dir
+                    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+                    with os.fdopen(fd, 'wb') as f:
+                        np.save(f, arr)
+                    os.replace(tmp, dest)
+                self.misses += 1
+        return _to_layer(np.load(paths[0], mmap_mode='r'), np.load(paths[1]))
+
+    def load_preview(self, path, preview_size):
+        """Preview-size SparseLayer for `path`, decoding an image only on a cache miss."""
+        return self._entry(path, preview_size, 'prev',
+                           lambda: self._build_preview(path, preview_size))
+
+    def load_full(self, path, preview_size):
+        """Full-size SparseLayer for `path`, memory-mapped from the cache."""
+        return self._entry(path, preview_size, 'full',
+                           lambda: SparseLayer.trim(_normalized(path)))
+
+    def _build_preview(self, path, preview_size):
+        thumb = self.thumbnails(path) if self.thumbnails else None
+        if thumb:
+            with Image.open(thumb) as im:
+                if im.size == tuple(preview_size):
+                    self.thumbnail_hits += 1
+                    return SparseLayer.trim(im)
+        return SparseLayer.trim(_normalized(path).resize(preview_size, Image.LANCZOS))
+
+    def prune(self):
+        """Delete cache files except those of the files loaded since the last prune.
+
+        Both sizes of a loaded file are kept (as long as it is unchanged), so
+        a full-size entry outlives sessions that only load previews. Files that
+        can't be deleted yet (on Windows, ones still memory-mapped by a layer
+        in use) are skipped and go on a later prune.
+        """
+        keep = set()
+        for path, preview_size in self._used:
+            if os.path.exists(path):
+                for kind in self.KINDS:
+                    keep.update(self._paths(path, preview_size, kind))
+        removed = 0
+        for fn in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, fn)
+            if fn.endswith('.npy') and path not in keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                removed += 1
+        self._used = set()
+        with self._locks_lock:
+            self._locks = {}
+        return removed
+
+
+def _to_layer(arr, box):
+    # zero-copy view over the memory map; the image is read-only
+    h, w = arr.shape[:2]
+    img = Image.frombuffer('RGBA', (w, h), arr, 'raw', 'RGBA', 0, 1)
+    x, y, cw, ch = (int(v) for v in box)
+    return SparseLayer(img, (x, y), (cw, ch))
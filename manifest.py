@@ -0,0 +1,318 @@
+"""
+manifest.py — in-process layer manifest shared by the web generator.
+
+Lists the images (SOURCE_EXTS) of every layer folder once, keeps them in
+memory and only re-lists a folder when its mtime changes. Each file also gets a short content
+hash (re-computed only when its mtime/size change) for fingerprinted URLs.
+Every change bumps `version`, which callers use as a cache key for anything
+derived from the file lists.
+
+Usage:
+    manifest = LayerManifest('static', LAYER_ORDER)
+    files = manifest.files()      # {layer: [fname, ...]}
+    hashes = manifest.hashes()    # {layer: {fname: 'a1b2c3d4e5'}}
+    manifest.watch()              # optional background watcher (dev only)
+
+AssetVariants does the same for build_assets.py output, so routes can look up
+the WebP/AVIF/preview variants of a layer file, and AtlasMap for its packed
+per-layer atlas sheets.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from werkzeug.security import safe_join
+
+from build_assets import SOURCE_EXTS
+
+HASH_LEN = 10  # hex chars of sha1 used in fingerprinted URLs
+
+try:
+    # optional: inotify/FSEvents backed watcher
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+
+def _mtime(folder):
+    try:
+        return os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:HASH_LEN]
+
+
+def _list_sources(folder):
+    try:
+        return sorted(f for f in os.listdir(folder) if f.lower().endswith(SOURCE_EXTS))
+    except FileNotFoundError:
+        return []
+
+
+class LayerManifest:
+    def __init__(self, static_path, layers, check_interval=1.0):
+        self.static_path = static_path
+        self.layers = list(layers)
+        # how often (seconds) files() may stat the folders; 0 = every call
+        self.check_interval = check_interval
+        self._state = (0, {}, {})
+        self._mtimes = {}
+        self._stats = {}  # path -> (mtime, size, digest)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.refresh(force=True)
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    def folder(self, layer):
+        return os.path.join(self.static_path, layer)
+
+    def _hash(self, path):
+        """Content hash of `path`, re-read only when its mtime or size changed."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        cached = self._stats.get(path)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        digest = _digest(path)
+        self._stats[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def refresh(self, force=False):
+        """Re-list any layer folder whose mtime changed and re-hash edited files.
+
+        Returns True if the manifest changed.
+        """
+        with self._lock:
+            changed = False
+            version, files, hashes = self._state
+            files, hashes = dict(files), dict(hashes)
+            for layer in self.layers:
+                mtime = _mtime(self.folder(layer))
+                if force or self._mtimes.get(layer, -1) != mtime:
+                    listing = _list_sources(self.folder(layer))
+                    self._mtimes[layer] = mtime
+                    if files.get(layer) != listing:
+                        files[layer] = listing
+                        changed = True
+                # in-place edits don't touch the folder mtime, so stat each file
+                layer_hashes = {
+                    fname: self._hash(os.path.join(self.folder(layer), fname))
+                    for fname in files[layer]
+                }
+                if hashes.get(layer) != layer_hashes:
+                    hashes[layer] = layer_hashes
+                    changed = True
+            if changed:
+                # swap in one tuple so readers never see a half-built manifest
+                self._state = (version + 1, files, hashes)
+            self._checked_at = time.monotonic()
+            return changed
+
+    def snapshot(self):
+        """(version, {layer: [fname, ...]}), re-validated at most every `check_interval` seconds."""
+        if self._watcher is None and time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+        return self._state[:2]
+
+    def files(self):
+        return self.snapshot()[1]
+
+    def hashes(self):
+        """{layer: {fname: content hash}} matching the current snapshot."""
+        self.snapshot()
+        return self._state[2]
+
+    def is_layer_file(self, path):
+        """True for a static URL path naming a listed layer file ('bodies/basic.png')."""
+        layer, _, fname = path.partition('/')
+        return fname in self.hashes().get(layer, {})
+
+    def file_hash(self, path):
+        """Content hash for a static URL path like 'bodies/basic.png', or None.
+
+        Layer files come from the manifest; any other file under the static
+        folder (css, mp3s) is hashed on demand and memoized by mtime/size.
+        """
+        layer, _, fname = path.partition('/')
+        digest = self.hashes().get(layer, {}).get(fname)
+        if digest is None:
+            full = safe_join(self.static_path, path)
+            if full and os.path.isfile(full):
+                with self._lock:
+                    digest = self._hash(full)
+        return digest
+
+    def watch(self, poll_interval=1.0):
+        """Start a daemon watcher that refreshes the manifest when a layer folder changes.
+
+        Uses watchdog (inotify) when installed, otherwise polls folder mtimes.
+        """
+        if self._watcher is not None:
+            return
+        if Observer is not None:
+            manifest = self
+
+            class _Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    manifest.refresh()
+
+            observer = Observer()
+            for layer in self.layers:
+                if os.path.isdir(self.folder(layer)):
+                    observer.schedule(_Handler(), self.folder(layer), recursive=False)
+            observer.daemon = True
+            observer.start()
+            self._watcher = observer
+        else:
+            def poll():
+                while True:
+                    time.sleep(poll_interval)
+                    self.refresh()
+
+            thread = threading.Thread(target=poll, name='layer-manifest-watch', daemon=True)
+            thread.start()
+            self._watcher = thread
+
+
+class _BuildIndex:
+    """A JSON file written by build_assets.py, reloaded when its mtime changes.
+
+    The mtime is checked at most every `check_interval` seconds; the index is
+    empty when no build has been run.
+    """
+    filename = None
+
+    def __init__(self, build_path, check_interval=1.0):
+        self.build_path = build_path
+        self.check_interval = check_interval
+        self._index = {}
+        self._mtime = None
+        self._checked_at = -check_interval
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        self.index()
+        return self._mtime
+
+    def index(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                self._checked_at = now
+                path = os.path.join(self.build_path, self.filename)
+                mtime = _mtime(path)
+                if mtime != self._mtime:
+                    self._mtime = mtime
+                    self._index = self._load(path) if mtime else {}
+        return self._index
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                return self._parse(json.load(f))
+        except ValueError:
+            return {}
+
+
+class AssetVariants(_BuildIndex):
+    """Index of the web variants written by build_assets.py.
+
+    Maps a static URL path ('bodies/basic.png', 'background/sky.jpg') to
+    its derived files ({'full.webp': 'bodies/basic.webp', 'preview.avif':
+    ...}), plus the 'source' they were built from: (content hash, mtime_ns,
+    size).
+    """
+    filename = 'manifest.json'
+
+    def _parse(self, data):
+        files = data.get('files', {})
+        index = {}
+        for rel, entry in files.items():
+            outputs = entry.get('outputs', {})
+            if 'full.png' in outputs:
+                index[rel] = dict(
+                    outputs, source=(entry['hash'], entry['mtime'], entry['size'])
+                )
+        return index
+
+    def best(self, path, size, formats, digest=None):
+        """Build-relative path of the first of `formats` available at `size`, else None.
+
+        With `digest` (the file's current HASH_LEN hash), variants built from
+        an older version of the file are ignored.
+        """
+        outputs = self.index().get(path)
+        if not outputs or (digest and not outputs['source'][0].startswith(digest)):
+            return None
+        for fmt in formats:
+            variant = outputs.get(f"{size}.{fmt}")
+            if variant:
+                return variant
+        return None
+
+    def thumbnail(self, path, src_path, size='preview'):
+        """Filesystem path of the pre-rendered PNG of `path` at `size`, or None.
+
+        Only returned while `src_path` still has the mtime and size it was
+        built from, so edited files fall back to resizing the original.
+        """
+        outputs = self.index().get(path)
+        if not outputs or f"{size}.png" not in outputs:
+            return None
+        try:
+            st = os.stat(src_path)
+        except FileNotFoundError:
+            return None
+        if outputs['source'][1:] != (st.st_mtime_ns, st.st_size):
+            return None
+        return os.path.join(self.build_path, outputs[f"{size}.png"])
+
+
+class AtlasMap(_BuildIndex):
+    """Per-layer atlas sheets written by build_assets.py.
+
+    index() is {size: {layer: {'canvas', 'sheets', 'frames'}}}, where each
+    frame is [sheet, sx, sy, w, h, dx, dy, source hash].
+    """
+    filename = 'atlas.json'
+
+    def _parse(self, data):
+        index = {}
+        for layer, info in data.get('layers', {}).items():
+            for size, atlas in info.get('sizes', {}).items():
+                index.setdefault(size, {})[layer] = atlas
+        return index
+
+    def sheet(self, size, layer, n):
+        """{'files': {fmt: build path}, 'hash', 'size'} of one sheet, else None."""
+        sheets = self.index().get(size, {}).get(layer, {}).get('sheets', [])
+        return sheets[n] if 0 <= n < len(sheets) else None
+
+    def client(self):
+        """What the page needs: {size: {layer: {'canvas', 'sheets': [hash], 'frames'}}}."""
+        return {
+            size: {
+                layer: {'canvas': atlas['canvas'],
+                        'sheets': [sheet['hash'] for sheet in atlas['sheets']],
+                        'frames': atlas['frames']}
+                for layer, atlas in layers.items()
+            }
+            for size, layers in self.index().items()
+        }
@@ -0,0 +1,39 @@
+"""
+noise.py — vectorized per-pixel noise for trait layers.
+
+Same look as the old pixel loop in test.py: one grey offset per pixel,
+`(u - center) * level * 255` with u uniform in [0, 1), added to R, G and B,
+clamped to 0..255, alpha untouched. Works on the whole image at once and
+takes a seeded numpy Generator so a roll can be reproduced exactly.
+"""
+import zlib
+
+import numpy as np
+from PIL import Image
+
+
+def layer_rng(seed, layer):
+    """Independent, reproducible noise stream for `layer` (a layer name) of a roll."""
+    return np.random.default_rng([seed, zlib.crc32(layer.encode())])
+
+
+def add_noise(img, level, rng=None, center=0.5):
+    """Return a noised RGBA copy of `img`; `img` itself is not modified."""
+    if rng is None:
+        rng = np.random.default_rng()
+    arr = np.array(img.convert('RGBA'), dtype=np.int16)
+    noise = ((rng.random(arr.shape[:2], dtype=np.float32) - center) * (level * 255)).astype(np.int16)
+    arr[..., :3] += noise[..., None]
+    np.clip(arr, 0, 255, out=arr)
+    return Image.fromarray(arr.astype(np.uint8), 'RGBA')
+
+
+def noise_tile(n, size, level, center=0.5):
+    """Greyscale tile `n` of the same noise, stored as 128 + offset.
+
+    The web page blends a repeating tile over the finished composite instead
+    of noising every layer pixel by pixel in JS.
+    """
+    rng = np.random.default_rng([n, zlib.crc32(b'tile')])
+    offset = (rng.random((size, size), dtype=np.float32) - center) * (level * 255)
+    return Image.fromarray(np.clip(128 + offset, 0, 255).astype(np.uint8), 'L')
@@ -0,0 +1,144 @@
+"""
+phash.py — perceptual hashes of characters and a near-duplicate index.
+
+Two characters can differ only in a trait that barely shows (small earrings
+under hair, a toy behind accessories) and look the same. `phash` reduces an
+image to a 64-bit DCT hash, so visually close images get hashes a few bits
+apart. `HashIndex` finds every stored hash within a Hamming radius of a
+query without scanning them all (multi-index hashing):
+
+    the 64 bits are split into `chunks` words, each with its own table of
+    word value → entries. If two hashes are within r bits, then by pigeonhole
+    at least one word is within r // chunks bits, so a query only probes the
+    values within that sub-radius of each of its words (17 per word for
+    16-bit words and r < 8) and checks those few candidates in full.
+
+With 16-bit words a probe hits n / 65536 entries on average, so lookups stay
+cheap well past 100k hashes. generate.py uses this to reject near-duplicate
+combos while planning (--near).
+
+Run (from the repo root) to list near-duplicate pairs in a rendered collection:
+    python phash.py build/collection --radius 6
+"""
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS   = 64
+HASH_CHUNKS = 4       # 16-bit words for the multi-index tables
+DCT_SIZE    = 32      # image is reduced to DCT_SIZE² grey before the transform
+DCT_KEEP    = 8       # lowest DCT_KEEP² frequencies make the hash
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n)).astype(np.float32)
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+
+def phash(img):
+    """64-bit perceptual hash of `img` (transparent areas count as black)."""
+    if img.mode == 'RGBA':
+        img = Image.alpha_composite(Image.new('RGBA', img.size, (0, 0, 0, 255)), img)
+    grey = np.asarray(img.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.LANCZOS), np.float32)
+    low = (_DCT @ grey @ _DCT.T)[:DCT_KEEP, :DCT_KEEP].ravel()
+    bits = low > np.median(low[1:])   # the DC term would dominate the median
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    """HASH_BITS-bit hashes searchable by Hamming distance up to `radius`.
+
+    Entries are numbered in insertion order; `keys` holds whatever was added
+    alongside each hash (e.g. the item id).
+    """
+
+    def __init__(self, radius, chunks=HASH_CHUNKS, bits=HASH_BITS):
+        if not 0 < chunks <= bits:
+            raise ValueError(f"chunks must be in 1..{bits}")
+        self.radius = radius
+        self.hashes = []
+        self.keys = []
+        widths = [bits // chunks + (i < bits % chunks) for i in range(chunks)]
+        self._words = []   # (shift, mask) per chunk
+        shift = bits
+        for width in widths:
+            shift -= width
+            self._words.append((shift, (1 << width) - 1))
+        self._tables = [{} for _ in widths]
+        sub = radius // chunks
+        # xor masks for every word value within `sub` bits, closest first
+        self._probes = [
+            [sum(1 << b for b in flips) for k in range(sub + 1)
+             for flips in itertools.combinations(range(width), k)]
+            for width in widths
+        ]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, h, key=None):
+        n = len(self.hashes)
+        self.hashes.append(h)
+        self.keys.append(key)
+        for (shift, mask), table in zip(self._words, self._tables):
+            table.setdefault((h >> shift) & mask, []).append(n)
+        return n
+
+    def _candidates(self, h):
+        for (shift, mask), table, probes in zip(self._words, self._tables, self._probes):
+            word = (h >> shift) & mask
+            for flip in probes:
+                yield from table.get(word ^ flip, ())
+
+    def near(self, h):
+        """[(entry, distance), ...] within the radius, closest first."""
+        found = {}
+        for n in self._candidates(h):
+            if n not in found:
+                d = hamming(h, self.hashes[n])
+                if d <= self.radius:
+                    found[n] = d
+        return sorted(found.items(), key=lambda e: e[1])
+
+    def first(self, h):
+        """Some entry within the radius, or None (stops at the first match)."""
+        for n in self._candidates(h):
+            if hamming(h, self.hashes[n]) <= self.radius:
+                return n
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List near-duplicate images in a collection.")
+    parser.add_argument('folder', help="directory of rendered PNGs (generate.py --out)")
+    parser.add_argument('--radius', type=int, default=6, help="max differing hash bits")
+    args = parser.parse_args()
+
+    names = sorted(f for f in os.listdir(args.folder) if f.lower().endswith('.png'))
+    index = HashIndex(args.radius)
+    pairs = []
+    start = time.perf_counter()
+    for name in names:
+        with Image.open(os.path.join(args.folder, name)) as im:
+            h = phash(im)
+        pairs += [(index.keys[n], name, d) for n, d in index.near(h)]
+        index.add(h, name)
+    for a, b, d in sorted(pairs, key=lambda p: p[2]):
+        print(f"{d:3}  {a}  {b}")
+    print(f"{len(names)} images, {len(pairs)} near-duplicate pairs within {args.radius} bits "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
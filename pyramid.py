@@ -0,0 +1,89 @@
+"""
+pyramid.py — cached scaled copies of one image for the collage editor.
+
+`get(scale)` is the high-quality LANCZOS resize from the original, cached per
+scale step so going back to a scale already visited (or saving at it) costs
+nothing. `approx(scale)` is for live slider drags: it resamples bilinearly
+from the smallest mipmap level (successive 2x box reductions) that is still
+at least the target size, which is much cheaper on big backgrounds.
+`rows(scale, top, bottom)` is a horizontal slice of `get(scale)` for tiled
+collage saves, resized on its own so the whole scaled image is never built.
+"""
+import math
+import threading
+
+from PIL import Image
+
+from render import LRUCache
+
+LANCZOS_SUPPORT = 3   # filter radius in source pixels at 1:1
+
+
+class ScalePyramid:
+    def __init__(self, image, max_entries=6):
+        self.image = image
+        self._levels = [image]
+        self._lock = threading.Lock()
+        self._scaled = LRUCache(max_entries=max_entries)
+
+    def size_at(self, scale):
+        return (max(1, int(self.image.width * scale)), max(1, int(self.image.height * scale)))
+
+    @staticmethod
+    def _key(scale):
+        return round(scale, 2)
+
+    def cached(self, scale):
+        """The high-quality image at `scale` if already rendered, else None."""
+        return self._scaled.get(self._key(scale))
+
+    def get(self, scale):
+        """High-quality image at `scale`, resized from the original once per step."""
+        img = self.cached(scale)
+        if img is None:
+            size = self.size_at(scale)
+            img = self.image if size == self.image.size else self.image.resize(size, Image.LANCZOS)
+            self._scaled.put(self._key(scale), img)
+        return img
+
+    def _level_for(self, size):
+        with self._lock:
+            level = self._levels[-1]
+            while level.width // 2 >= size[0] and level.height // 2 >= size[1]:
+                level = level.reduce(2)
+                self._levels.append(level)
+            for level in self._levels:
+                if level.width // 2 < size[0] or level.height // 2 < size[1]:
+                    return level
+            return self._levels[-1]
+
+    def approx(self, scale):
+        """Fast preview at `scale`: the cached high-quality image if any, else a mipmap resample."""
+        img = self.cached(scale)
+        if img is not None:
+            return img
+        size = self.size_at(scale)
+        level = self._level_for(size)
+        return level if level.size == size else level.resize(size, Image.BILINEAR)
+
+    def rows(self, scale, top, bottom):
+        """Rows [top, bottom) of get(scale), without building the whole scaled image.
+
+        Sliced from the cached image when there is one, else LANCZOS-resized
+        from the matching rows of the original (within one level of get()).
+        """
+        img = self.cached(scale)
+        if img is None and self.size_at(scale) == self.image.size:
+            img = self.image
+        if img is not None:
+            return img.crop((0, top, img.width, bottom))
+        width, height = self.size_at(scale)
+        step = self.image.height / height
+        # resize() visits every source row for a box, so first cut the rows the
+        # box and the LANCZOS support (3 source pixels, times step if shrinking) reach
+        margin = math.ceil(LANCZOS_SUPPORT * max(step, 1.0)) + 1
+        y0 = max(0, math.floor(top * step) - margin)
+        y1 = min(self.image.height, math.ceil(bottom * step) + margin)
+        src = self.image.crop((0, y0, self.image.width, y1))
+        return src.resize((width, bottom - top), Image.LANCZOS,
+                          box=(0, top * step - y0, src.width, bottom * step - y0))
@@ -0,0 +1,276 @@
+"""
+render.py — server-side compositing of a trait selection into one image.
+
+Decoded RGBA layers stay resident in memory (`LayerStore`) and recently
+rendered combinations are kept in a bounded LRU (`LRUCache`), so re-rolling a
+combo that was already seen costs one dict lookup.
+
+Layers are held trimmed to their non-transparent bounding box (`SparseLayer`);
+compositing only blends that region instead of the whole 790x875 canvas.
+
+Pass a `StageTimer` to `LayerStore.get`, `composite` and `encode` to see
+where the time goes (decode, convert (normalize), resize, trim, noise, paste, encode);
+benchmarks/suite.py reports those stages as p50/p95.
+"""
+import io
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from PIL import Image
+
+from build_assets import normalize
+from noise import add_noise, layer_rng
+
+# matches the look of the browser noise in templates/index.html
+WEB_NOISE_LEVEL  = 0.2
+WEB_NOISE_CENTER = 0.2
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by entry count and/or total weight.
+
+    `weigh(value)` gives each entry's size (e.g. bytes); with `max_bytes` set,
+    the least recently used entries are evicted until the total fits.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None, weigh=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.weigh = weigh or len
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value, size = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data[key] = (value, size)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.weigh(value) if self.max_bytes is not None else 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._data[key] = (value, size)
+            self.total_bytes += size
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+            ):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.total_bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class StageTimer:
+    """Wall time per named stage: `with timer('noise'): ...`."""
+
+    def __init__(self):
+        self.samples = {}   # stage → [seconds, ...]
+
+    @contextmanager
+    def __call__(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        """{stage: {'n', 'p50_ms', 'p95_ms', 'total_ms'}}."""
+        out = {}
+        for stage, times in self.samples.items():
+            ms = sorted(t * 1000 for t in times)
+            out[stage] = {
+                'n': len(ms),
+                'p50_ms': round(ms[len(ms) // 2], 3),
+                'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+                'total_ms': round(sum(ms), 3),
+            }
+        return out
+
+
+def _untimed(stage):
+    return nullcontext()
+
+
+class SparseLayer:
+    """A layer's non-transparent bounding box and where it sits on its canvas."""
+
+    __slots__ = ('image', 'offset', 'size')
+
+    def __init__(self, image, offset, size):
+        self.image = image    # cropped RGBA
+        self.offset = offset  # (x, y) of the crop on the canvas
+        self.size = size      # full canvas (w, h)
+
+    @classmethod
+    def trim(cls, img):
+        img = img.convert('RGBA')
+        bbox = img.getchannel('A').getbbox()
+        if bbox is None:
+            # fully transparent (e.g. none.png): keep a 1x1 empty pixel
+            return cls(Image.new('RGBA', (1, 1), (0, 0, 0, 0)), (0, 0), img.size)
+        if bbox == (0, 0) + img.size:
+            return cls(img, (0, 0), img.size)
+        return cls(img.crop(bbox), bbox[:2], img.size)
+
+    def with_image(self, image):
+        """Same placement, different pixels (e.g. after noise)."""
+        return SparseLayer(image, self.offset, self.size)
+
+    def to_image(self):
+        """Expand back to a full-canvas RGBA image."""
+        if self.image.size == self.size:
+            return self.image
+        canvas = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        canvas.paste(self.image, self.offset)
+        return canvas
+
+    @property
+    def nbytes(self):
+        return self.image.width * self.image.height * 4
+
+
+class PrefixStack:
+    """Bounded cache of partial composites, keyed by the layers below them.
+
+    `compose` looks for the longest cached bottom prefix of `layers` and only
+    draws the layers above it, caching each new prefix on the way up. When
+    the lower layers stay the same between calls (locked traits, one trait
+    changed), only the changed layer and those above it are re-blended.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self._cache = LRUCache(max_entries=None, max_bytes=max_bytes,
+                               weigh=lambda im: im.width * im.height * 4)
+        self.reused = self.drawn = 0   # layers taken from cache / blended, all calls
+
+    def compose(self, size, layers, draw):
+        """Composite [(key, item), ...] bottom to top; `draw(comp, item)` blends one in place.
+
+        `key` must identify everything that affects the layer's pixels
+        (file, noise level, seed).
+        """
+        prefixes = []
+        prefix = (tuple(size),)
+        for key, _ in layers:
+            prefix += (key,)
+            prefixes.append(prefix)
+        start, comp = 0, None
+        for i in range(len(layers), 0, -1):
+            cached = self._cache.get(prefixes[i - 1])
+            if cached is not None:
+                start, comp = i, cached.copy()
+                break
+        if comp is None:
+            comp = Image.new('RGBA', size, (0, 0, 0, 0))
+        for i in range(start, len(layers)):
+            draw(comp, layers[i][1])
+            self._cache.put(prefixes[i], comp.copy())
+        self.reused += start
+        self.drawn += len(layers) - start
+        return comp
+
+    def clear(self):
+        self._cache.clear()
+
+
+class LayerStore:
+    """Decoded full-size layers as SparseLayers, loaded on first use and kept resident."""
+
+    def __init__(self, static_path, image_size):
+        self.static_path = static_path
+        self.image_size = image_size
+        self._images = {}
+        self._lock = threading.Lock()
+
+    def get(self, layer, fname, timer=_untimed):
+        key = (layer, fname)
+        im = self._images.get(key)
+        if im is None:
+            with timer('decode'):
+                im = Image.open(os.path.join(self.static_path, layer, fname))
+                im.load()
+            with timer('convert'):
+                # pad/stretch exactly as build_assets.py does for build/static
+                im = normalize(im, layer)
+            if im.size != self.image_size:
+                with timer('resize'):
+                    im = im.resize(self.image_size, Image.LANCZOS)
+            with timer('trim'):
+                im = SparseLayer.trim(im)
+            with self._lock:
+                im = self._images.setdefault(key, im)
+        return im
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+
+def composite(store, selection, seed=None, size=None,
+              noise_level=WEB_NOISE_LEVEL, noise_center=WEB_NOISE_CENTER, timer=_untimed):
+    """Flatten `selection` ([(layer, fname), ...] bottom to top) into one RGBA image.
+
+    Each layer gets its own noise stream derived from `seed`, so the same
+    (selection, seed) always renders identically.
+    """
+    comp = Image.new('RGBA', store.image_size, (0, 0, 0, 0))
+    for layer, fname in selection:
+        sparse = store.get(layer, fname, timer)
+        im = sparse.image
+        if noise_level and seed is not None:
+            with timer('noise'):
+                im = add_noise(im, noise_level, layer_rng(seed, layer), noise_center)
+        with timer('paste'):
+            comp.alpha_composite(im, sparse.offset)
+    if size and size != comp.size:
+        with timer('scale'):
+            comp = comp.resize(size, Image.LANCZOS)
+    return comp
+
+
+def layer_image(store, layer, fname, seed=None,
+                noise_level=WEB_NOISE_LEVEL, noise_center=WEB_NOISE_CENTER):
+    """One layer on its full canvas, noised exactly as `composite` noises it."""
+    sparse = store.get(layer, fname)
+    im = sparse.image
+    if noise_level and seed is not None:
+        im = add_noise(im, noise_level, layer_rng(seed, layer), noise_center)
+    return sparse.with_image(im).to_image()
+
+
+def encode(img, fmt='png', timer=_untimed):
+    buf = io.BytesIO()
+    with timer(f'encode_{fmt}'):
+        if fmt == 'jpeg':
+            img.convert('RGB').save(buf, 'JPEG', quality=88)
+        elif fmt == 'webp':
+            img.save(buf, 'WEBP', quality=88)
+        else:
+            img.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def random_seed():
+    return random.getrandbits(32)
@@ -0,0 +1,240 @@
+"""
+sampler.py — rarity-weighted trait sampling for bulk generation.
+
+Weights and layer rules come from an optional sidecar, rarity.json:
+
+    {
+      "weights": {"hairs": {"wavgreen.png": 0.5, "bald.png": 4}},
+      "exclude": [{"hairs": ["bald.png"], "accessories": ["dark-crown.png"]}]
+    }
+
+Files not listed weigh 1, weight 0 disables a file. Each "exclude" rule
+names one or more files per layer; a combo that matches the rule on every
+layer it names is rejected and redrawn. Each layer is drawn in O(1) from a
+Walker/Vose alias table, and `ComboSet` rejects combos already generated
+with a single hash lookup on their trait ID (see traits.py).
+
+Run (from the repo root) to check the distribution over many draws:
+    python sampler.py 1000000 --rarity rarity.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from traits import SEED_RADIX, TraitIndex, from_code, to_code
+
+RARITY_PATH = 'rarity.json'
+
+
+def load_rarity(path=RARITY_PATH):
+    """(weights, exclude rules) from the sidecar; empty if it doesn't exist."""
+    if not os.path.exists(path):
+        return {}, []
+    with open(path) as f:
+        cfg = json.load(f)
+    return cfg.get('weights', {}), cfg.get('exclude', [])
+
+
+class AliasTable:
+    """O(1) draws from a fixed discrete distribution (Vose's alias method)."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("need at least one positive weight")
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:  # leftovers are 1 up to float error
+            self.prob[i] = 1.0
+
+    def draw(self, rng):
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class ComboSet:
+    """Trait combos already generated, keyed by their trait ID.
+
+    With a path, existing codes are loaded on init and `save()` writes the set
+    back (one base-36 code per line).
+    """
+
+    def __init__(self, index, path=None):
+        self.index = index
+        self.path = path
+        self._ids = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._ids.update(from_code(line) for line in f.read().split())
+
+    def key(self, traits):
+        # the noise seed is irrelevant for uniqueness, so it is left at 0
+        return self.index.encode(traits) // SEED_RADIX
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, traits):
+        return self.key(traits) in self._ids
+
+    def add(self, traits):
+        """Add `traits`; False if the combo was already in the set."""
+        k = self.key(traits)
+        if k in self._ids:
+            return False
+        self._ids.add(k)
+        return True
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(to_code(k) for k in self._ids))
+        os.replace(tmp, self.path)
+
+
+class RaritySampler:
+    def __init__(self, layers, layer_files, weights=None, exclude=()):
+        weights = weights or {}
+        self.layers = []
+        self.files = {}
+        self.targets = {}   # layer → {fname: target probability}
+        self.tables = {}
+        for layer in layers:
+            layer_weights = weights.get(layer, {})
+            files = [f for f in layer_files.get(layer, []) if layer_weights.get(f, 1) > 0]
+            if not files:
+                continue
+            w = [layer_weights.get(f, 1) for f in files]
+            total = sum(w)
+            self.layers.append(layer)
+            self.files[layer] = files
+            self.targets[layer] = {f: x / total for f, x in zip(files, w)}
+            self.tables[layer] = AliasTable(w)
+
+        # rule lookup by (layer, fname), so a combo only checks rules it touches
+        self.rules = [{layer: frozenset([v] if isinstance(v, str) else v)
+                       for layer, v in rule.items()} for rule in exclude if rule]
+        self._rules_for = {}
+        for rule in self.rules:
+            first_layer, first_files = next(iter(rule.items()))
+            for fname in first_files:
+                self._rules_for.setdefault((first_layer, fname), []).append(rule)
+
+        self.counts = {layer: dict.fromkeys(files, 0) for layer, files in self.files.items()}
+        self.drawn = 0
+        self.rejected = 0   # by exclusion rules
+        self.duplicates = 0
+        self.refused = 0    # by sample()'s accept callback
+
+    def allowed(self, traits):
+        for layer, fname in traits.items():
+            for rule in self._rules_for.get((layer, fname), ()):
+                if all(traits.get(l) in files for l, files in rule.items()):
+                    return False
+        return True
+
+    def draw(self, rng, max_rejects=10_000):
+        """One combo that passes the exclusion rules (not counted)."""
+        for _ in range(max_rejects):
+            traits = {layer: self.files[layer][self.tables[layer].draw(rng)]
+                      for layer in self.layers}
+            if self.allowed(traits):
+                return traits
+            self.rejected += 1
+        raise ValueError("exclusion rules reject (almost) every combo")
+
+    def sample(self, rng, count, seen=None, max_tries=50, accept=None):
+        """Up to `count` new combos, skipping any already in `seen` (a ComboSet).
+
+        With `accept`, combos it returns False for are skipped too (e.g.
+        near-duplicates, see generate.py). Stops early once `max_tries * count`
+        draws have come back skipped.
+        """
+        combos = []
+        misses = 0
+        while len(combos) < count and misses < max_tries * max(count, 1):
+            traits = self.draw(rng)
+            if seen is not None and not seen.add(traits):
+                self.duplicates += 1
+                misses += 1
+                continue
+            if accept is not None and not accept(traits):
+                self.refused += 1
+                misses += 1
+                continue
+            self._count(traits)
+            combos.append(traits)
+        return combos
+
+    def _count(self, traits):
+        self.drawn += 1
+        for layer, fname in traits.items():
+            self.counts[layer][fname] += 1
+
+    def report(self):
+        """Rows of (layer, fname, target, achieved) over everything sampled."""
+        n = max(self.drawn, 1)
+        return [(layer, fname, target, self.counts[layer][fname] / n)
+                for layer in self.layers
+                for fname, target in self.targets[layer].items()]
+
+    def format_report(self, top=None):
+        """Text report, worst drift first (all rows unless `top` is given)."""
+        rows = sorted(self.report(), key=lambda r: -abs(r[3] - r[2]))
+        lines = [f"{self.drawn} combos, {self.rejected} rejected by rules, "
+                 f"{self.duplicates} duplicates skipped"
+                 + (f", {self.refused} near-duplicates skipped" if self.refused else ''),
+                 f"{'layer':<14}{'file':<36}{'target':>9}{'actual':>9}{'drift':>9}"]
+        for layer, fname, target, actual in rows[:top]:
+            lines.append(f"{layer:<14}{fname[:35]:<36}{target:>9.4%}{actual:>9.4%}"
+                         f"{actual - target:>+9.4%}")
+        return '\n'.join(lines)
+
+
+def main():
+    from config import LAYER_ORDER, STATIC_PATH
+    from manifest import LayerManifest
+
+    parser = argparse.ArgumentParser(description="Check the rarity distribution over many draws.")
+    parser.add_argument('draws', type=int, nargs='?', default=1_000_000)
+    parser.add_argument('--rarity', default=RARITY_PATH)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--unique', action='store_true', help="reject duplicate combos")
+    parser.add_argument('--seen', default=None,
+                        help="with --unique: file of combos to skip, updated after the run")
+    parser.add_argument('--top', type=int, default=20, help="rows to print, worst drift first")
+    args = parser.parse_args()
+
+    layer_files = LayerManifest(STATIC_PATH, LAYER_ORDER).files()
+    index = TraitIndex(LAYER_ORDER)
+    index.sync(layer_files, save=False)
+    weights, exclude = load_rarity(args.rarity)
+    sampler = RaritySampler(LAYER_ORDER, layer_files, weights, exclude)
+    rng = random.Random(args.seed)
+    seen = ComboSet(index, args.seen) if args.unique else None
+
+    start = time.perf_counter()
+    sampler.sample(rng, args.draws, seen)
+    elapsed = time.perf_counter() - start
+    if seen is not None:
+        seen.save()
+    print(f"{sampler.drawn / elapsed:,.0f} combos/s")
+    print(sampler.format_report(args.top))
+
+
+if __name__ == '__main__':
+    main()
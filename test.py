@@ -3,12 +3,12 @@ app.py — intuitive Tkinter randomizer with left preview, right trait panel,
 and new collage editor with resizable background and draggable composites.
 
 Dependencies:
-    pip install pillow
+    pip install pillow numpy
 
 Layout:
     app.py
     static/
-        background/*.png
+        background/*.png|*.jpg
         accessories2/*.png
         bodies/*.png
         eyes/*.png
@@ -28,15 +28,34 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 
+import export
+import noise
+from build_assets import BUILD_PATH, SOURCE_EXTS
+from collage import Collage
+from layer_cache import LayerCache
+from manifest import AssetVariants
+from pyramid import ScalePyramid
+from render import LRUCache, PrefixStack
+from worker import RenderWorker
+
 # Configuration
 IMAGE_SIZE = (790, 875)  # Original size for output images
 PREVIEW_SCALE = 0.4  # Smaller preview for compact UI
+FULL_CACHE_MB = 128  # Cap for full-resolution layers kept in memory
+SETTLE_MS = 200  # Slider idle time before the high-quality resample
 STATIC_PATH = os.path.join(os.getcwd(), "static")
 LAYER_ORDER = [
     'background', 'accessories2', 'bodies', 'eyes', 'mouth',
     'shirts', 'hairs', 'earrings', 'toys', 'accessories', 'health'
 ]
 
+
+def with_source_ext(old_name, new_name):
+    """`new_name`, keeping `old_name`'s extension unless it already has an image one."""
+    if new_name.lower().endswith(SOURCE_EXTS):
+        return new_name
+    return new_name + os.path.splitext(old_name)[1]
+
 class MyMilliosApp:
     def __init__(self):
         self.root = tk.Tk()
@@ -49,21 +68,49 @@ class MyMilliosApp:
         )
         self.layer_files = {}
         self.preview_cache = {}
+        # build_assets.py thumbnails seed the preview cache without decoding full PNGs
+        self.asset_variants = AssetVariants(os.path.join(os.getcwd(), BUILD_PATH))
+        self.layer_cache = LayerCache(
+            os.path.join(os.getcwd(), '.layer-cache'), thumbnails=self._thumbnail
+        )
+        # full-res layers are loaded on demand; only previews stay resident
+        self.full_cache = LRUCache(
+            max_entries=None, max_bytes=FULL_CACHE_MB * 2**20,
+            weigh=lambda layer: layer.nbytes
+        )
         self.noise_enabled = {layer: tk.BooleanVar(value=True) for layer in LAYER_ORDER}
         self.noise_levels = {layer: tk.DoubleVar(value=0.4) for layer in LAYER_ORDER}  # Per-layer noise level
+        # per-layer noise seeds; randomize() re-rolls them only for unlocked layers,
+        # so locked layers keep their pixels and their cached prefix composites
+        self.layer_seeds = {}
+        self.preview_stack = PrefixStack()
+        # PNG export options for downloads and collage saves (see export.py)
+        self.export_preset = tk.StringVar(value=export.DEFAULT_PRESET)
+        self.export_palette = tk.BooleanVar(value=False)
+        self.export_strip = tk.BooleanVar(value=True)
         self.manual_selection = []
         self.rename_map = {}
         self.bg_image = None
         self.bg_tk = None
         self.bg_scale = 1.0
+        self.bg_pyramid = None
         self.composites = []
+        self.pyramids = {}  # id(composite image) -> ScalePyramid
+        self._settle_jobs = {}
         self.current_composite = None
         self.drag_data = {"x": 0, "y": 0, "item": None}
+        # composites, resizes and saves run here; results come back via root.after
+        self.worker = RenderWorker(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self.load_images()
         self._build_ui()
         self.randomize()
         self.root.mainloop()
 
+    def _on_close(self):
+        self.worker.shutdown()
+        self.root.destroy()
+
     def load_images(self):
         """Load or reload images from static folders."""
         self.layer_files.clear()
@@ -71,14 +118,24 @@ class MyMilliosApp:
         for layer in LAYER_ORDER:
             folder = os.path.join(STATIC_PATH, layer)
             self.layer_files[layer] = sorted(
-                f for f in os.listdir(folder) if f.lower().endswith('.png')
+                f for f in os.listdir(folder) if f.lower().endswith(SOURCE_EXTS)
             ) if os.path.isdir(folder) else []
             cache = []
             for fname in self.layer_files[layer]:
-                full = Image.open(os.path.join(STATIC_PATH, layer, fname)).convert('RGBA')
-                preview = full.resize(self.preview_size, Image.LANCZOS)
-                cache.append((full, fname, preview))
+                # decoded pixels come from the on-disk cache; only new/changed files are decoded
+                path = os.path.join(STATIC_PATH, layer, fname)
+                preview = self.layer_cache.load_preview(path, self.preview_size)
+                cache.append((path, fname, preview))
             self.preview_cache[layer] = cache
+        # drop our references to the old memory maps first, then delete unused entries
+        self.full_cache.clear()
+        self.preview_stack.clear()
+        self.layer_cache.prune()
+        cache = self.layer_cache
+        print(f"Previews: {cache.hits} cached, {cache.thumbnail_hits} from thumbnails, "
+              f"{cache.misses - cache.thumbnail_hits} resized from originals")
+        cache.hits = cache.misses = cache.thumbnail_hits = 0
+        self.report_memory(log=True)
         # Update OptionMenus if UI is built
         if hasattr(self, 'controls'):
             for layer, (var, ent, menu, _, _) in self.controls.items():
@@ -88,6 +145,32 @@ class MyMilliosApp:
                     menu['menu'].add_command(label=opt, command=tk._setit(var, opt))
                 var.set('')
 
+    def _thumbnail(self, path):
+        rel = os.path.relpath(path, STATIC_PATH).replace(os.sep, '/')
+        return self.asset_variants.thumbnail(rel, path)
+
+    def full_image(self, path):
+        """Full-resolution SparseLayer for `path`, via the bounded LRU (worker-safe)."""
+        img = self.full_cache.get(path)
+        if img is None:
+            img = self.layer_cache.load_full(path, self.preview_size)
+            self.full_cache.put(path, img)
+        return img
+
+    def report_memory(self, log=False):
+        previews = sum(
+            p.nbytes for cache in self.preview_cache.values() for _, _, p in cache
+        )
+        msg = (
+            f"Previews: {previews / 2**20:.1f} MB | "
+            f"Full-res: {self.full_cache.total_bytes / 2**20:.1f}/{FULL_CACHE_MB} MB "
+            f"({len(self.full_cache)} layers)"
+        )
+        if log:
+            print(msg)
+        if hasattr(self, 'memory_label'):
+            self.memory_label.config(text=msg)
+
     def _build_ui(self):
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=5, pady=5)
@@ -193,6 +276,25 @@ class MyMilliosApp:
             tk.Button(
                 bottom, text=text, font=('Arial', 9), command=cmd
             ).pack(side='left', padx=5)
+        self.memory_label = tk.Label(bottom, text='', font=('Arial', 8), fg='gray')
+        self.memory_label.pack(side='right', padx=5)
+
+        # PNG export options
+        export_bar = tk.Frame(randomizer_tab)
+        export_bar.pack(fill='x', pady=(0, 5))
+        tk.Label(export_bar, text="PNG:", font=('Arial', 9)).pack(side='left', padx=(5, 2))
+        ttk.OptionMenu(
+            export_bar, self.export_preset, self.export_preset.get(), *export.PRESETS
+        ).pack(side='left')
+        tk.Checkbutton(
+            export_bar, text="Palette (flat layers)", variable=self.export_palette,
+            font=('Arial', 9)
+        ).pack(side='left', padx=5)
+        tk.Checkbutton(
+            export_bar, text="Strip metadata", variable=self.export_strip, font=('Arial', 9)
+        ).pack(side='left', padx=5)
+        self.export_label = tk.Label(export_bar, text='', font=('Arial', 8), fg='gray')
+        self.export_label.pack(side='right', padx=5)
 
         # Collage Tab
         collage_tab = tk.Frame(self.notebook)
@@ -210,16 +312,20 @@ class MyMilliosApp:
         ).pack(fill='x', padx=5, pady=2)
         tk.Label(collage_controls, text="Background Scale:", font=('Arial', 9)).pack(anchor='w', padx=5, pady=2)
         self.bg_scale_var = tk.DoubleVar(value=1.0)
-        tk.Scale(
+        bg_scale = tk.Scale(
             collage_controls, from_=0.1, to=2.0, resolution=0.1, orient='horizontal',
             variable=self.bg_scale_var, command=self.update_background, length=150
-        ).pack(fill='x', padx=5, pady=2)
+        )
+        bg_scale.pack(fill='x', padx=5, pady=2)
+        bg_scale.bind("<ButtonRelease-1>", lambda e: self.update_background(final=True))
         tk.Label(collage_controls, text="Composite Scale:", font=('Arial', 9)).pack(anchor='w', padx=5, pady=2)
         self.comp_scale_var = tk.DoubleVar(value=1.0)
-        tk.Scale(
+        comp_scale = tk.Scale(
             collage_controls, from_=0.1, to=2.0, resolution=0.1, orient='horizontal',
             variable=self.comp_scale_var, command=self.update_composite_scale, length=150
-        ).pack(fill='x', padx=5, pady=2)
+        )
+        comp_scale.pack(fill='x', padx=5, pady=2)
+        comp_scale.bind("<ButtonRelease-1>", lambda e: self.update_composite_scale(final=True))
         tk.Button(
             collage_controls, text="Save Collage", font=('Arial', 9),
             command=self.save_collage
@@ -248,36 +354,57 @@ class MyMilliosApp:
         if not path:
             return
         self.bg_image = Image.open(path).convert('RGBA')
+        self.bg_pyramid = ScalePyramid(self.bg_image)
         self.bg_scale = 1.0
         self.bg_scale_var.set(1.0)
         self.update_background()
         messagebox.showinfo("Loaded", f"Background loaded: {os.path.basename(path)}")
 
-    def update_background(self, *args):
+    def _render_scaled(self, key, pyramid, scale, on_done, final=False):
+        """Show `pyramid` at `scale`: a cheap mipmap preview while the slider moves,
+        then the cached or LANCZOS-resampled image once it is released or settles."""
+        pending = self._settle_jobs.pop(key, None)
+        if pending:
+            self.root.after_cancel(pending)
+        hq = pyramid.cached(scale)
+        if hq is not None:
+            # an approx/get job still running for an older scale must not land after this
+            self.worker.supersede(key)
+            on_done(hq)
+        elif final:
+            self.worker.submit(key, pyramid.get, scale, on_done=on_done, on_error=self._render_failed)
+        else:
+            self.worker.submit(key, pyramid.approx, scale, on_done=on_done, on_error=self._render_failed)
+            self._settle_jobs[key] = self.root.after(
+                SETTLE_MS, lambda: self._render_scaled(key, pyramid, scale, on_done, final=True)
+            )
+
+    def update_background(self, *args, final=False):
         if not self.bg_image:
             return
         self.bg_scale = self.bg_scale_var.get()
-        new_size = (int(self.bg_image.width * self.bg_scale), int(self.bg_image.height * self.bg_scale))
-        scaled_bg = self.bg_image.resize(new_size, Image.LANCZOS)
+        self._render_scaled('background', self.bg_pyramid, self.bg_scale, self._show_background, final)
+
+    def _show_background(self, scaled_bg):
         self.bg_tk = ImageTk.PhotoImage(scaled_bg)
         if self.bg_image_id:
             self.collage_canvas.delete(self.bg_image_id)
         self.bg_image_id = self.collage_canvas.create_image(0, 0, image=self.bg_tk, anchor='nw')
         for _, _, _, _, canvas_id, _ in self.composites:
             self.collage_canvas.tag_raise(canvas_id, self.bg_image_id)
-        self.collage_canvas.config(scrollregion=(0, 0, new_size[0], new_size[1]))
+        self.collage_canvas.config(scrollregion=(0, 0, scaled_bg.width, scaled_bg.height))
 
     def copy_to_collage(self):
         if not self.bg_image:
             messagebox.showwarning("Warning", "Load a background image first.")
             return
-        comp = Image.new('RGBA', IMAGE_SIZE, (0, 0, 0, 0))
-        for layer, img, fname in self.current:
-            if layer not in ['background', 'health']:
-                im = img.copy()
-                if self.noise_enabled[layer].get():
-                    im = self.add_noise(im, self.noise_levels[layer].get())
-                comp.paste(im, (0, 0), im)
+        self.worker.submit(
+            None, self._compose_full, list(self.current), dict(self.layer_seeds),
+            self._noise_settings(), ('background', 'health'),
+            on_done=self._add_composite, on_error=self._render_failed
+        )
+
+    def _add_composite(self, comp):
         canvas_w = self.collage_canvas.winfo_width()
         canvas_h = self.collage_canvas.winfo_height()
         x = canvas_w // 2
@@ -289,6 +416,7 @@ class MyMilliosApp:
         self.current_composite = len(self.composites) - 1
         self.comp_scale_var.set(1.0)
         self.update_composite_scale()
+        self.report_memory()
 
     def place_composite(self, event):
         if not self.composites:
@@ -329,17 +457,31 @@ class MyMilliosApp:
                 self.comp_scale_var.set(self.composites[idx][3])
                 break
 
-    def update_composite_scale(self, *args):
+    def _pyramid(self, comp):
+        pyramid = self.pyramids.get(id(comp))
+        if pyramid is None:
+            pyramid = self.pyramids[id(comp)] = ScalePyramid(comp)
+        return pyramid
+
+    def update_composite_scale(self, *args, final=False):
         if self.current_composite is None or not self.composites:
             return
         scale = self.comp_scale_var.get()
         idx = self.current_composite
-        comp, x, y, _, canvas_id, _ = self.composites[idx]
-        new_size = (int(comp.width * scale), int(comp.height * scale))
-        scaled_img = comp.resize(new_size, Image.LANCZOS)
-        tk_img = ImageTk.PhotoImage(scaled_img)
-        self.collage_canvas.itemconfig(canvas_id, image=tk_img)
-        self.composites[idx] = (comp, x, y, scale, canvas_id, tk_img)
+        comp = self.composites[idx][0]
+        # keyed per composite: slider ticks supersede each other
+        self._render_scaled(
+            ('composite', id(comp)), self._pyramid(comp), scale,
+            lambda img: self._show_composite_scale(comp, scale, img), final
+        )
+
+    def _show_composite_scale(self, comp, scale, scaled_img):
+        for idx, (c, x, y, _, canvas_id, _) in enumerate(self.composites):
+            if c is comp:
+                tk_img = ImageTk.PhotoImage(scaled_img)
+                self.collage_canvas.itemconfig(canvas_id, image=tk_img)
+                self.composites[idx] = (comp, x, y, scale, canvas_id, tk_img)
+                break
 
     def save_collage(self):
         if not self.bg_image:
@@ -350,28 +492,34 @@ class MyMilliosApp:
         )
         if not path:
             return
-        bg_size = (int(self.bg_image.width * self.bg_scale), int(self.bg_image.height * self.bg_scale))
-        collage = self.bg_image.resize(bg_size, Image.LANCZOS).convert('RGBA')
-        for comp, x, y, scale, _, _ in self.composites:
-            comp_size = (int(comp.width * scale), int(comp.height * scale))
-            scaled_comp = comp.resize(comp_size, Image.LANCZOS)
-            paste_x = int(x - comp_size[0] / 2)
-            paste_y = int(y - comp_size[1] / 2)
-            collage.paste(scaled_comp, (paste_x, paste_y), scaled_comp)
-        collage.save(path)
-        messagebox.showinfo("Saved", f"Collage saved: {path}")
+        placed = [(self._pyramid(comp), x, y, scale) for comp, x, y, scale, _, _ in self.composites]
+        self.worker.submit(
+            None, self._render_collage, self.bg_pyramid, self.bg_scale, placed, path,
+            self._export_settings(),
+            on_done=lambda done: messagebox.showinfo(
+                "Saved", f"Collage saved: {path}\n{self._export_done(done)}"
+            ),
+            on_error=self._render_failed
+        )
+
+    @staticmethod
+    def _render_collage(bg_pyramid, bg_scale, placed, path, settings):
+        """Render and save the collage strip by strip (see collage.py); runs on the render worker."""
+        result, ms = export.timed(Collage(bg_pyramid, bg_scale, placed).save, path, settings)
+        return [result], ms
 
     def clear_composites(self):
         for _, _, _, _, canvas_id, _ in self.composites:
             self.collage_canvas.delete(canvas_id)
         self.composites = []
+        self.pyramids.clear()
         self.current_composite = None
         self.comp_scale_var.set(1.0)
 
     def _rename_file(self, layer, old_name, new_name):
         if not old_name or not new_name:
             return False
-        new_name = new_name if new_name.lower().endswith('.png') else new_name + '.png'
+        new_name = with_source_ext(old_name, new_name)
         old_path = os.path.join(STATIC_PATH, layer, old_name)
         new_path = os.path.join(STATIC_PATH, layer, new_name)
         if os.path.exists(new_path):
@@ -382,13 +530,13 @@ class MyMilliosApp:
             idx = self.layer_files[layer].index(old_name)
             self.layer_files[layer][idx] = new_name
             self.layer_files[layer].sort()
-            for i, (full, fname, prev) in enumerate(self.preview_cache[layer]):
+            for i, (path, fname, prev) in enumerate(self.preview_cache[layer]):
                 if fname == old_name:
-                    self.preview_cache[layer][i] = (full, new_name, prev)
+                    self.preview_cache[layer][i] = (new_path, new_name, prev)
                     break
-            for i, (l, full, fname, prev) in enumerate(self.manual_selection):
+            for i, (l, path, fname, prev) in enumerate(self.manual_selection):
                 if l == layer and fname == old_name:
-                    self.manual_selection[i] = (layer, full, new_name, prev)
+                    self.manual_selection[i] = (layer, new_path, new_name, prev)
                     break
             self.rename_map[(layer, old_name)] = new_name
             return True
@@ -399,11 +547,11 @@ class MyMilliosApp:
     def set_layer(self, layer, fname, new_name):
         if not fname:
             return
-        for full, f, prev in self.preview_cache[layer]:
+        for path, f, prev in self.preview_cache[layer]:
             if f == fname:
                 # Remove existing selection for this layer
-                self.manual_selection = [(l, img, n, p) for l, img, n, p in self.manual_selection if l != layer]
-                self.manual_selection.append((layer, full, fname, prev))
+                self.manual_selection = [(l, pth, n, p) for l, pth, n, p in self.manual_selection if l != layer]
+                self.manual_selection.append((layer, path, fname, prev))
                 break
         if new_name.strip():
             if self._rename_file(layer, fname, new_name):
@@ -424,7 +572,7 @@ class MyMilliosApp:
             opts = [f for _, f, _ in self.preview_cache[layer]]
             for opt in opts:
                 menu['menu'].add_command(label=opt, command=tk._setit(var, opt))
-            new_fname = new_name if new_name.lower().endswith('.png') else new_name + '.png'
+            new_fname = with_source_ext(fname, new_name)
             var.set(new_fname)
         self.randomize()
 
@@ -433,10 +581,10 @@ class MyMilliosApp:
             fname = var.get()
             new_name = ent.get().strip()
             if fname:
-                for full, f, prev in self.preview_cache[layer]:
+                for path, f, prev in self.preview_cache[layer]:
                     if f == fname:
-                        self.manual_selection = [(l, img, n, p) for l, img, n, p in self.manual_selection if l != layer]
-                        self.manual_selection.append((layer, full, fname, prev))
+                        self.manual_selection = [(l, pth, n, p) for l, pth, n, p in self.manual_selection if l != layer]
+                        self.manual_selection.append((layer, path, fname, prev))
                         break
             if new_name:
                 if self._rename_file(layer, fname, new_name):
@@ -445,45 +593,83 @@ class MyMilliosApp:
                     opts = [f for _, f, _ in self.preview_cache[layer]]
                     for opt in opts:
                         menu['menu'].add_command(label=opt, command=tk._setit(var, opt))
-                    new_fname = new_name if new_name.lower().endswith('.png') else new_name + '.png'
+                    new_fname = with_source_ext(fname, new_name)
                     var.set(new_fname)
         self.randomize()
 
-    def add_noise(self, img, level):
-        px = img.load()
-        for x in range(img.width):
-            for y in range(img.height):
-                r, g, b, a = px[x, y]
-                noise = int((random.random() - 0.5) * level * 255)
-                px[x, y] = (
-                    max(0, min(255, r + noise)),
-                    max(0, min(255, g + noise)),
-                    max(0, min(255, b + noise)),
-                    a
-                )
-        return img
+    def _noise_settings(self):
+        """{layer: level or 0}, read from the Tk controls so worker jobs don't touch Tk."""
+        return {
+            layer: self.noise_levels[layer].get() if self.noise_enabled[layer].get() else 0
+            for layer in LAYER_ORDER
+        }
+
+    @staticmethod
+    def _compose(layers, size, seeds, levels, stack=None):
+        """Paste (layer, SparseLayer) pairs bottom to top with each layer's noise.
+
+        With a PrefixStack, layers below the first changed one come from cache.
+        """
+        def draw(comp, item):
+            layer, sparse = item
+            im = sparse.image
+            if levels[layer]:
+                im = noise.add_noise(im, levels[layer], noise.layer_rng(seeds[layer], layer))
+            comp.paste(im, sparse.offset, im)
+
+        if stack is not None:
+            keyed = [((layer, id(sparse), levels[layer], seeds[layer]), (layer, sparse))
+                     for layer, sparse in layers]
+            return stack.compose(size, keyed, draw)
+        comp = Image.new('RGBA', size, (0, 0, 0, 0))
+        for item in layers:
+            draw(comp, item)
+        return comp
+
+    def _compose_full(self, current, seeds, levels, skip=()):
+        layers = [(layer, self.full_image(path)) for layer, path, _ in current if layer not in skip]
+        return self._compose(layers, IMAGE_SIZE, seeds, levels)
+
+    def _export_settings(self):
+        return export.ExportSettings(
+            self.export_preset.get(), self.export_palette.get(), self.export_strip.get()
+        )
+
+    def _export_done(self, done):
+        """Show bytes/ms of a finished export ((results, wall ms)); returns the summary."""
+        msg = export.summarize(*done)
+        self.export_label.config(text=f"Last export: {msg}")
+        self.report_memory()
+        return msg
+
+    def _render_failed(self, err):
+        messagebox.showerror("Error", f"Render failed: {err}")
 
     def randomize(self):
-        comp = Image.new('RGBA', self.preview_size, (0, 0, 0, 0))
         self.current = []
+        layers = []
         manual_layers = {layer for layer, _, _, _ in self.manual_selection}
         for layer in LAYER_ORDER:
             if layer in manual_layers:
-                for l, full, fname, prev in self.manual_selection:
+                for l, path, fname, prev in self.manual_selection:
                     if l == layer:
-                        img = prev.copy()
-                        if self.noise_enabled[layer].get():
-                            img = self.add_noise(img, self.noise_levels[layer].get())
-                        comp.paste(img, (0, 0), img)
-                        self.current.append((layer, full, fname))
+                        layers.append((layer, prev))
+                        self.current.append((layer, path, fname))
                         break
+                self.layer_seeds.setdefault(layer, random.getrandbits(32))
             else:
-                full, fname, prev = random.choice(self.preview_cache[layer])
-                img = prev.copy()
-                if self.noise_enabled[layer].get():
-                    img = self.add_noise(img, self.noise_levels[layer].get())
-                comp.paste(img, (0, 0), img)
-                self.current.append((layer, full, fname))
+                path, fname, prev = random.choice(self.preview_cache[layer])
+                layers.append((layer, prev))
+                self.current.append((layer, path, fname))
+                self.layer_seeds[layer] = random.getrandbits(32)
+        # a newer roll supersedes one still rendering
+        self.worker.submit(
+            'preview', self._compose, layers, self.preview_size, dict(self.layer_seeds),
+            self._noise_settings(), self.preview_stack,
+            on_done=self._show_preview, on_error=self._render_failed
+        )
+
+    def _show_preview(self, comp):
         self.tkcomp = ImageTk.PhotoImage(comp)
         self.canvas.itemconfig(self.canvas_image, image=self.tkcomp)
 
@@ -493,24 +679,40 @@ class MyMilliosApp:
         )
         if not path:
             return
-        full = Image.new('RGBA', IMAGE_SIZE, (0, 0, 0, 0))
-        for layer, img, fname in self.current:
-            im = img.copy()
-            if self.noise_enabled[layer].get():
-                im = self.add_noise(im, self.noise_levels[layer].get())
-            full.paste(im, (0, 0), im)
-        full.save(path)
+        current, seeds, levels = list(self.current), dict(self.layer_seeds), self._noise_settings()
+        settings = self._export_settings()
+
+        def job():
+            img = self._compose_full(current, seeds, levels)
+            result, ms = export.timed(export.save_png, img, path, settings)
+            return [result], ms
+
+        self.worker.submit(None, job, on_done=self._export_done, on_error=self._render_failed)
 
     def download_all_layers(self):
         d = filedialog.askdirectory()
         if not d:
             return
-        for layer, img, fname in self.current:
-            save_name = self.rename_map.get((layer, fname), fname)
-            im = img.copy()
-            if self.noise_enabled[layer].get():
-                im = self.add_noise(im, self.noise_levels[layer].get())
-            im.save(os.path.join(d, save_name))
+        current, seeds, levels = list(self.current), dict(self.layer_seeds), self._noise_settings()
+        names = [self.rename_map.get((layer, fname), fname) for layer, _, fname in current]
+        settings = self._export_settings()
+
+        def layer_image(layer, path):
+            sparse = self.full_image(path)
+            im = sparse.image
+            if levels[layer]:
+                im = noise.add_noise(im, levels[layer], noise.layer_rng(seeds[layer], layer))
+            # layer files keep their full canvas so they still stack at (0, 0)
+            return sparse.with_image(im).to_image()
+
+        def job():
+            # noise + encode of every layer run concurrently
+            return export.timed(export.export_many, [
+                (os.path.join(d, save_name), lambda l=layer, p=path: layer_image(l, p))
+                for (layer, path, _), save_name in zip(current, names)
+            ], settings)
+
+        self.worker.submit(None, job, on_done=self._export_done, on_error=self._render_failed)
 
 if __name__ == '__main__':
     app = MyMilliosApp()
\ No newline at end of file
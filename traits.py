@@ -0,0 +1,121 @@
+"""
+traits.py — stable, seed-addressable character IDs.
+
+A character is one file (or nothing) per LAYER_ORDER layer plus a 32-bit
+noise seed. Its ID is a mixed-radix integer with one digit per layer:
+
+    id = ((d[0] * C + d[1]) * C + ... + d[n-1]) * 2**32 + noise_seed
+
+where d[i] is 1 + the file's position in that layer's registry (0 = layer
+left empty) and C is LAYER_CAPACITY. Decoding is a fixed number of divmods.
+
+Positions come from traits.json, an append-only registry: new files are added
+at the end of their layer and removed files keep their slot, so existing IDs
+never change when art is added (a sorted directory listing would shift them).
+IDs are shown as compact base-36 codes.
+"""
+import json
+import os
+import string
+import threading
+
+REGISTRY_PATH  = 'traits.json'
+LAYER_CAPACITY = 256        # digits per layer: 0 = empty, 1..255 = files
+SEED_RADIX     = 2**32
+CODE_ALPHABET  = string.digits + string.ascii_lowercase
+
+
+def to_code(n):
+    """Integer ID → base-36 code."""
+    if n == 0:
+        return '0'
+    out = []
+    while n:
+        n, r = divmod(n, 36)
+        out.append(CODE_ALPHABET[r])
+    return ''.join(reversed(out))
+
+
+def from_code(code):
+    """Base-36 code → integer ID (ValueError if malformed)."""
+    return int(code, 36)
+
+
+class TraitIndex:
+    def __init__(self, layers, path=REGISTRY_PATH):
+        self.layers = list(layers)
+        self.path = path
+        self._lock = threading.Lock()
+        self.registry = {layer: [] for layer in self.layers}
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            for layer in self.layers:
+                self.registry[layer] = list(saved.get(layer, []))
+        self._rebuild_positions()
+
+    def _rebuild_positions(self):
+        self._positions = {
+            layer: {fname: i for i, fname in enumerate(files)}
+            for layer, files in self.registry.items()
+        }
+
+    @property
+    def max_id(self):
+        return LAYER_CAPACITY ** len(self.layers) * SEED_RADIX
+
+    def sync(self, layer_files, save=True):
+        """Append files not yet in the registry. Returns True if it grew.
+
+        Saving is best effort: on a read-only deploy the registry stays in memory.
+        """
+        with self._lock:
+            grew = False
+            for layer in self.layers:
+                known = self._positions[layer]
+                for fname in layer_files.get(layer, []):
+                    if fname not in known:
+                        if len(self.registry[layer]) >= LAYER_CAPACITY - 1:
+                            raise ValueError(f"{layer}: more than {LAYER_CAPACITY - 1} files")
+                        known[fname] = len(self.registry[layer])
+                        self.registry[layer].append(fname)
+                        grew = True
+            if grew and save:
+                try:
+                    tmp = self.path + '.tmp'
+                    with open(tmp, 'w') as f:
+                        json.dump(self.registry, f, indent=1)
+                    os.replace(tmp, self.path)
+                except OSError:
+                    pass
+            return grew
+
+    def encode(self, traits, seed=0):
+        """{layer: fname} (+ noise seed) → integer ID. Missing layers encode as empty.
+
+        ValueError if `seed` is outside 0..SEED_RADIX-1: it would not survive
+        the round trip, and the ID would name a different noise than was rendered.
+        """
+        if not 0 <= seed < SEED_RADIX:
+            raise ValueError(f"seed out of range: {seed}")
+        n = 0
+        for layer in self.layers:
+            fname = traits.get(layer)
+            digit = 0 if fname is None else self._positions[layer][fname] + 1
+            n = n * LAYER_CAPACITY + digit
+        return n * SEED_RADIX + seed
+
+    def decode(self, n):
+        """Integer ID → ({layer: fname}, seed). KeyError if a digit has no file."""
+        if not 0 <= n < self.max_id:
+            raise ValueError(f"id out of range: {n}")
+        n, seed = divmod(n, SEED_RADIX)
+        traits = {}
+        for layer in reversed(self.layers):
+            n, digit = divmod(n, LAYER_CAPACITY)
+            if digit:
+                files = self.registry[layer]
+                if digit > len(files):
+                    raise KeyError(f"{layer}: no file at slot {digit}")
+                traits[layer] = files[digit - 1]
+        return {layer: traits[layer] for layer in self.layers if layer in traits}, seed
@@ -0,0 +1,76 @@
+"""
+worker.py — background render worker for the Tk app.
+
+Heavy PIL work (compositing, LANCZOS resizes, PNG saves) runs on a small
+thread pool; Pillow and numpy release the GIL for most of it. Tk is not
+thread-safe, so finished results are queued and delivered on the Tk thread by
+a `root.after` poll. Jobs submitted under the same key supersede each other:
+a job that is superseded before it starts is skipped, and a stale result that
+finishes late is dropped, so dragging a slider only renders the latest value.
+"""
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RenderWorker:
+    def __init__(self, root, workers=2, poll_ms=15):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='render')
+        self._results = queue.Queue()
+        self._latest = {}  # key -> generation of the newest job
+        self._lock = threading.Lock()
+        self.root.after(self.poll_ms, self._drain)
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None):
+        """Run fn(*args) off the Tk thread; on_done(result) is called on the Tk thread.
+
+        `key=None` jobs are never superseded (saves, exports).
+        """
+        with self._lock:
+            gen = self._latest.get(key, 0) + 1
+            if key is not None:
+                self._latest[key] = gen
+        self._pool.submit(self._run, key, gen, fn, args, on_done, on_error)
+
+    def supersede(self, key):
+        """Mark every job under `key` stale, e.g. when its result was served from a cache."""
+        with self._lock:
+            self._latest[key] = self._latest.get(key, 0) + 1
+
+    def _current(self, key, gen):
+        return key is None or self._latest.get(key) == gen
+
+    def _run(self, key, gen, fn, args, on_done, on_error):
+        if not self._current(key, gen):
+            return
+        try:
+            result = fn(*args)
+        except Exception as e:
+            traceback.print_exc()
+            self._results.put((on_error, e))
+            return
+        # a newer job for the same key may have been submitted meanwhile
+        if self._current(key, gen):
+            self._results.put((on_done, result))
+
+    def _drain(self):
+        try:
+            while True:
+                callback, value = self._results.get_nowait()
+                if callback is not None:
+                    # one failing callback must not drop the results behind it
+                    try:
+                        callback(value)
+                    except Exception:
+                        traceback.print_exc()
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(self.poll_ms, self._drain)
+
+    def shutdown(self):
+        """Drop queued jobs; ones already running finish before the interpreter exits."""
+        self._pool.shutdown(wait=False, cancel_futures=True)